@@ -0,0 +1,85 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Hex GeoJSON: the original iterrows/geojson.Feature/json.dumps serializer vs.
+yelpmap.hexjson, cold (empty boundary cache) and warm.
+
+Run from the repository root with `python -m benchmarks.bench_geojson`.
+"""
+
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import h3
+from geojson import Feature, FeatureCollection
+
+from benchmarks.synthetic import CENTER
+from yelpmap.hexjson import boundary_cache, hex_df_to_geojson
+
+SIZES = [10_000, 500_000]
+
+
+def legacy_hex_df_to_geojson(df_hex, column_name = "value"):
+    """The original serializer from the Mapping page."""
+    list_features = []
+
+    for i,row in df_hex.iterrows():
+        try:
+            geometry_for_row = { "type" : "Polygon", "coordinates": [h3.h3_to_geo_boundary(h=row["hex_id"],geo_json=True)]}
+            feature = Feature(geometry = geometry_for_row , id=row["hex_id"], properties = {column_name : row[column_name]})
+            list_features.append(feature)
+        except:
+            print("An exception occurred for hex " + row["hex_id"])
+
+    feat_collection = FeatureCollection(list_features)
+    geojson_result = json.dumps(feat_collection)
+    return geojson_result
+
+
+def hex_frame(n, resolution=9):
+    """n distinct cells around CENTER with a random count column."""
+    center = h3.geo_to_h3(CENTER[0], CENTER[1], resolution)
+    k = 1
+    while 3 * k * k + 3 * k + 1 < n:
+        k += 1
+    cells = sorted(h3.k_ring(center, k))[:n]
+    counts = np.random.default_rng(0).integers(1, 100, len(cells))
+    return pd.DataFrame({'hex_id': cells, 'counts': counts})
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print("%8s %-22s %10s %12s" % ("cells", "serializer", "time (s)", "payload MB"))
+    for n in SIZES:
+        df = hex_frame(n)
+        runs = [("legacy", lambda: legacy_hex_df_to_geojson(df, 'counts'))]
+        runs.append(("hexjson cold", lambda: boundary_cache.clear() or hex_df_to_geojson(df, 'counts')))
+        runs.append(("hexjson warm", lambda: hex_df_to_geojson(df, 'counts')))
+        runs.append(("hexjson warm, 5 dp", lambda: hex_df_to_geojson(df, 'counts', precision=5)))
+        for name, run in runs:
+            payload, seconds = timed(run)
+            print("%8d %-22s %10.3f %12.2f" % (n, name, seconds, len(payload) / 1e6))
+
+
+if __name__ == "__main__":
+    main()
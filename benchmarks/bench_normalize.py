@@ -0,0 +1,62 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Business frame construction: per-row pd.concat vs. the columnar builder.
+
+Run from the repository root with `python -m benchmarks.bench_normalize`.
+The per-row version is quadratic, so it is only timed up to LEGACY_MAX rows.
+"""
+
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import paginate, synthetic_businesses
+from yelpmap.businesses import businesses_to_frame
+
+SIZES = [1_000, 100_000, 1_000_000]
+LEGACY_MAX = 10_000
+
+
+def legacy_frame(data):
+    """The original get_businesses loop."""
+    result_df = pd.DataFrame({'Name': [], 'Lat': [], 'Lon':[], 'Rating':[], 'RatingCount':[], 'Distance':[]})
+    for result in data:
+        listdic=pd.Series([result['name'], result['coordinates']['latitude'], result['coordinates']['longitude'],
+                           result['rating'], result['review_count'], result['distance']],
+                          index=['Name', 'Lat','Lon', 'Rating', 'RatingCount', 'Distance'])
+        result_df=pd.concat([result_df, listdic.to_frame().T], ignore_index=True)
+    return result_df
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print("%10s %14s %14s %12s" % ("rows", "columnar (s)", "per-row (s)", "frame MB"))
+    for n in SIZES:
+        data = synthetic_businesses(n)
+        pages = paginate(data)
+        df, columnar = timed(businesses_to_frame, pages)
+        legacy = timed(legacy_frame, data)[1] if n <= LEGACY_MAX else float('nan')
+        mb = df.memory_usage(deep=True).sum() / 1e6
+        print("%10d %14.3f %14.3f %12.1f" % (n, columnar, legacy, mb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Load a Streamlit page script's functions without running its UI."""
+
+import ast
+import os
+
+
+def page_namespace(path):
+    """
+    Execute the imports and definitions of the script at path, i.e. every
+    top-level statement before its first bare expression (for the pages that
+    is st.set_page_config(...)), and return the resulting namespace.
+    """
+    with open(path) as f:
+        source = f.read()
+    tree = ast.parse(source, path)
+    body = []
+    for node in tree.body:
+        if isinstance(node, ast.Expr) and not (body == [] and isinstance(node.value, ast.Constant)):
+            break
+        body.append(node)
+    namespace = {
+        "__name__": "page_" + os.path.splitext(os.path.basename(path))[0],
+        "__file__": os.path.abspath(path),
+    }
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, "exec"), namespace)
+    return namespace
@@ -0,0 +1,127 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A local stand-in for the Yelp business search endpoint."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PATH = "/v3/businesses/search"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != PATH:
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["50"])[0])
+        stub = self.server.stub
+        status, retry_after, delay = stub.next_response(offset)
+        if delay:
+            time.sleep(delay)
+        if status != 200:
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header("Retry-After", retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        businesses = stub.businesses
+        body = json.dumps({
+            "businesses": businesses[offset:offset + limit],
+            "total": len(businesses),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):  # the client timed out
+            return
+        stub.count(len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubYelpServer:
+    """
+    Serves `businesses` (a list of Yelp business dicts, replaceable at any
+    time) with offset/limit paging on 127.0.0.1. Use as a context manager;
+    `url` is the search URL and `bytes_sent` the response bytes so far.
+
+    fail() and stall() script error responses and slow responses, to
+    exercise the client's retries. `hits` logs every request as
+    (time.monotonic(), offset, status).
+    """
+
+    def __init__(self, businesses=()):
+        self.businesses = list(businesses)
+        self.bytes_sent = 0
+        self.requests = 0
+        self.hits = []
+        self._script = []  # [offset or None, status, retry_after, delay, times left]
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.url = "http://127.0.0.1:%d%s" % (self._server.server_address[1], PATH)
+
+    def fail(self, status, times=1, retry_after=None, offset=None):
+        """
+        Answer the next `times` requests (for `offset` only, if given) with
+        status and no body, plus a Retry-After header if retry_after (delta
+        seconds or an HTTP-date string) is given.
+        """
+        with self._lock:
+            self._script.append([offset, status, retry_after, 0.0, times])
+
+    def stall(self, seconds, times=1, offset=None):
+        """Wait `seconds` before answering the next `times` requests normally."""
+        with self._lock:
+            self._script.append([offset, 200, None, seconds, times])
+
+    def next_response(self, offset):
+        """(status, retry_after, delay) for a request, consuming the script."""
+        with self._lock:
+            response = (200, None, 0.0)
+            for entry in self._script:
+                if entry[0] is None or entry[0] == offset:
+                    response = tuple(entry[1:4])
+                    entry[4] -= 1
+                    if not entry[4]:
+                        self._script.remove(entry)
+                    break
+            self.hits.append((time.monotonic(), offset, response[0]))
+            return response
+
+    def count(self, nbytes):
+        with self._lock:
+            self.bytes_sent += nbytes
+            self.requests += 1
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,385 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Headless benchmark suite for every page's compute path.
+
+    python -m benchmarks.suite [--sizes 100,1000,...] [--only fetch,hexify,...]
+                               [--baseline FILE] [--save] [--tolerance 0.25]
+
+Every case is run once for wall time and once under tracemalloc for peak
+memory (of this process; pool workers aren't traced), and reports the bytes
+of what it produces: HTTP responses, GeoJSON, map HTML, frames or chart
+specs. Page functions (get_businesses, Hexify, choropleth_map,
+MapYelps_allinone, ...) come from the page scripts themselves via
+benchmarks.pages, and Hello.py and each page also run whole under
+streamlit.testing's AppTest.
+
+Everything runs offline: Yelp is a local stub server, agri.csv.gz a
+synthetic file, and all caches live in a temporary data directory. Modes
+that need the TIGER county boundaries run only if --counties (default:
+files/) already holds them.
+
+Results are compared with the baseline file when it exists; anything more
+than --tolerance worse is listed as a regression and the exit status is 1.
+--save writes this run as the new baseline.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.pages import page_namespace
+from benchmarks.stub_server import StubYelpServer
+from benchmarks.synthetic import synthetic_agri, synthetic_businesses, synthetic_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+METRICS = ("seconds", "peak_bytes", "payload_bytes")
+
+
+class Case:
+    """
+    One benchmark: setup(n) builds fresh, unmeasured input (caches cleared)
+    and run(state) does the measured work, returning payload bytes or None.
+    sizes=None runs it once, regardless of --sizes.
+    """
+
+    def __init__(self, name, variant, run, setup=None, sizes=(), max_size=None, needs_counties=False):
+        self.name = name
+        self.variant = variant
+        self.run = run
+        self.setup = setup or (lambda n: n)
+        self.sizes = sizes
+        self.max_size = max_size
+        self.needs_counties = needs_counties
+
+    def sizes_for(self, sizes):
+        if self.sizes is None:
+            return [None]
+        return [n for n in sizes if self.max_size is None or n <= self.max_size]
+
+
+def measure(case, n):
+    state = case.setup(n)
+    start = time.perf_counter()
+    payload = case.run(state)
+    seconds = time.perf_counter() - start
+
+    state = case.setup(n)
+    tracemalloc.start()
+    try:
+        case.run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak, "payload_bytes": payload}
+
+
+def legacy_julia_frame(c, iterations, m=960, n=640, s=400):
+    """The per-frame loop animation_demo used before the compacted engine."""
+    x = np.linspace(-m / s, m / s, num=m).reshape((1, m))
+    y = np.linspace(-n / s, n / s, num=n).reshape((n, 1))
+    Z = np.tile(x, (n, 1)) + 1j * np.tile(y, (1, m))
+    C = np.full((n, m), c)
+    M = np.full((n, m), True, dtype=bool)
+    N = np.zeros((n, m))
+    for i in range(iterations):
+        Z[M] = Z[M] * Z[M] + C[M]
+        M[np.abs(Z) > 2] = False
+        N[M] = i
+    return 1.0 - (N / N.max())
+
+
+def legacy_agri_chart(df, countries):
+    """The per-selection transform the DataFrame demo used before the columnar cache."""
+    import altair as alt
+
+    data = df.loc[countries]
+    data /= 1000000.0
+    data = data.T.reset_index()
+    data = pd.melt(data, id_vars=["index"]).rename(
+        columns={"index": "year", "value": "Gross Agricultural Product ($B)"}
+    )
+    chart = (
+        alt.Chart(data)
+        .mark_area(opacity=0.3)
+        .encode(
+            x="year:T",
+            y=alt.Y("Gross Agricultural Product ($B):Q", stack=None),
+            color="Region:N",
+        )
+    )
+    return chart.to_dict()
+
+
+def link_counties(source, data_dir):
+    """Make the county stores (and saved coverage) in source visible in data_dir."""
+    from yelpmap.counties import COUNTIES
+
+    found = False
+    for name in os.listdir(source) if os.path.isdir(source) else ():
+        if (name.startswith(COUNTIES) and name.endswith(".parquet")) or name == "coverage":
+            os.symlink(os.path.abspath(os.path.join(source, name)), os.path.join(data_dir, name))
+            found = found or name == COUNTIES + ".parquet"
+    return found
+
+
+def map_cases(ns, stub):
+    from yelpmap.hexjson import boundary_cache, hex_df_to_geojson
+    from yelpmap.mapcache import render_html
+    from yelpmap.pyramid import HexPyramid
+
+    terms = itertools.count()
+
+    def fetch_setup(n):
+        stub.businesses = synthetic_businesses(n)
+        # A new term per run, so the business cache never answers.
+        return "bench %d" % next(terms)
+
+    def fetch(term):
+        before = stub.bytes_sent
+        ns["get_businesses"]("Columbus, Ohio", term, "bench")
+        return stub.bytes_sent - before
+
+    def frame_setup(n):
+        ns["hex_pyramid"].clear()
+        boundary_cache.clear()
+        return synthetic_frame(n)
+
+    def level_setup(res):
+        def setup(n):
+            boundary_cache.clear()
+            return HexPyramid.from_frame(synthetic_frame(n), finest=res, coarsest=res).level(res)
+        return setup
+
+    def hexify(df):
+        ns["Hexify"](df, 7)
+
+    def map_run(**params):
+        return lambda df: len(render_html(ns["MapYelps_allinone"](df, res=8, zoom=9, **params)))
+
+    return [
+        # Yelp never returns more than 1000 results.
+        Case("fetch", "get_businesses (stub)", fetch, fetch_setup, max_size=1_000),
+        Case("hexify", "Hexify r7", hexify, frame_setup),
+        Case("geojson", "hex_df_to_geojson r9", lambda level: len(hex_df_to_geojson(level, "counts")),
+             level_setup(9)),
+        Case("choropleth", "choropleth_map r8",
+             lambda level: len(render_html(ns["choropleth_map"](level, "counts"))), level_setup(8)),
+        Case("map", "markers", map_run(markers=True, HexHeat=None), frame_setup),
+        Case("map", "heat", map_run(markers=False, HexHeat="Heat"), frame_setup),
+        Case("map", "hex", map_run(markers=False, HexHeat="Hex"), frame_setup),
+        Case("map", "hex + fill", map_run(markers=False, HexHeat="Hex", fillGeom=True), frame_setup,
+             needs_counties=True),
+        Case("map", "county", map_run(markers=False, HexHeat="County"), frame_setup, needs_counties=True),
+    ]
+
+
+def animation_cases():
+    from fractal import FRAMES, escape_counts, frame_constants, render_frames
+    from frame_delivery import PNGEncoder
+
+    c = frame_constants(0.7885)[FRAMES // 3]
+
+    def compacted(dtype):
+        def run(_):
+            escape_counts(c, 20, dtype=dtype)
+        return run
+
+    def animation(iterations):
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            frames = render_frames(iterations, 0.7885, pool=pool, encode=PNGEncoder())
+            return sum(len(frame.data) for frame in frames)
+
+    return [
+        Case("julia", "legacy frame, 20 it", lambda _: legacy_julia_frame(c, 20).nbytes, sizes=None),
+        Case("julia", "compacted complex128, 20 it", compacted(np.complex128), sizes=None),
+        Case("julia", "compacted complex64, 20 it", compacted(np.complex64), sizes=None),
+        Case("julia", "animation, 100 PNG frames, 10 it", lambda _: animation(10), sizes=None),
+    ]
+
+
+def dataframe_cases(ns, directory):
+    import un_data
+
+    os.makedirs(directory, exist_ok=True)
+
+    def setup(n):
+        # n points = regions x 47 years.
+        wide = synthetic_agri(max(2, n // 47))
+        store = os.path.join(directory, str(n))
+        if not os.path.exists(store):
+            path = store + ".csv.gz"
+            wide.to_csv(path, index=False)
+            un_data.build(store, url=path)
+        countries = list(wide.Region[:10])
+        return wide.set_index("Region"), un_data.UNData.open(store), countries
+
+    def legacy(state):
+        wide, _, countries = state
+        return len(json.dumps(legacy_agri_chart(wide, countries)))
+
+    def cached(state):
+        _, data, countries = state
+        data.table(countries)
+        chart = ns["area_chart"](data.chart_data(tuple(sorted(countries))))
+        return len(json.dumps(chart.to_dict()))
+
+    return [
+        Case("dataframe", "legacy copy/scale/melt", legacy, setup),
+        Case("dataframe", "columnar cache slice", cached, setup),
+    ]
+
+
+def page_cases(stub):
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:  # streamlit < 1.28
+        return []
+
+    def setup(_):
+        stub.businesses = synthetic_businesses(1_000)
+
+    def run(path):
+        def go(_):
+            at = AppTest.from_file(path, default_timeout=600)
+            at.secrets["YelpAPIKey"] = "bench"
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+        return go
+
+    pages = [os.path.join(ROOT, "Hello.py")] + sorted(
+        os.path.join(ROOT, "pages", name) for name in os.listdir(os.path.join(ROOT, "pages")) if name.endswith(".py"))
+    return [Case("page", os.path.relpath(path, ROOT), run(path), setup, sizes=None,
+                 needs_counties="Mapping" in path) for path in pages]
+
+
+def key(result):
+    return "%s/%s/%s" % (result["case"], result["variant"], result["n"])
+
+
+def compare(results, baseline, tolerance):
+    """[(key, metric, old, new)] for every metric worse than the baseline by more than tolerance."""
+    regressions = []
+    for result in results:
+        old = baseline.get(key(result))
+        if not old or "error" in result or "error" in old:
+            continue
+        for metric in METRICS:
+            if old.get(metric) and result.get(metric) is not None and result[metric] > old[metric] * (1 + tolerance):
+                regressions.append((key(result), metric, old[metric], result[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="points per dataset (default: %(default)s)")
+    parser.add_argument("--only", help="comma-separated case names (fetch, hexify, geojson, choropleth, map, julia, dataframe, page)")
+    parser.add_argument("--counties", default=os.environ.get("YELPMAP_DATA_DIR", os.path.join(ROOT, "files")),
+                        help="directory holding the county stores (default: %(default)s)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth (default: %(default)s)")
+    args = parser.parse_args(argv)
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    # Set before anything imports yelpmap, un_data or the pages: the data
+    # directories and the Yelp URL are read at import time.
+    os.environ["YELPMAP_DATA_DIR"] = data_dir
+    os.environ["UN_DATA_DIR"] = os.path.join(data_dir, "un")
+    stub = StubYelpServer()
+    os.environ["YELP_SEARCH_URL"] = stub.url
+
+    results = []
+    with stub:
+        try:
+            have_counties = link_counties(args.counties, data_dir)
+            # What the DataFrame page reads when it runs whole.
+            import un_data
+            agri = os.path.join(data_dir, "agri.csv.gz")
+            synthetic_agri(250).to_csv(agri, index=False)
+            un_data.build(os.environ["UN_DATA_DIR"], url=agri)
+
+            pages = os.path.join(ROOT, "pages")
+            cases = (map_cases(page_namespace(os.path.join(pages, "2_Mapping_Demo.py")), stub)
+                     + animation_cases()
+                     + dataframe_cases(page_namespace(os.path.join(pages, "3_DataFrame_Demo.py")),
+                                       os.path.join(data_dir, "agri"))
+                     + page_cases(stub))
+
+            print("%-10s %-32s %9s %10s %10s %12s" % ("case", "variant", "n", "time (s)", "peak MB", "payload MB"))
+            for case in cases:
+                if only and case.name not in only:
+                    continue
+                for n in case.sizes_for(sizes):
+                    result = {"case": case.name, "variant": case.variant, "n": n}
+                    if case.needs_counties and not have_counties:
+                        print("%-10s %-32s %9s   skipped: no county store in %s" % (case.name, case.variant, n or "-", args.counties))
+                        continue
+                    try:
+                        result.update(measure(case, n))
+                    except Exception as e:
+                        result["error"] = "%s: %s" % (type(e).__name__, e)
+                        print("%-10s %-32s %9s   FAILED %s" % (case.name, case.variant, n or "-", result["error"]))
+                    else:
+                        payload = result["payload_bytes"]
+                        print("%-10s %-32s %9s %10.3f %10.1f %12s" % (
+                            case.name, case.variant, n or "-", result["seconds"], result["peak_bytes"] / 1e6,
+                            "-" if payload is None else "%.2f" % (payload / 1e6)))
+                    results.append(result)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    status = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        print("\n%d regressions against %s (tolerance %d%%)" % (len(regressions), args.baseline, 100 * args.tolerance))
+        for name, metric, old, new in regressions:
+            print("  %-60s %-13s %12.4g -> %12.4g (%+.0f%%)" % (name, metric, old, new, 100 * (new / old - 1)))
+        status = 1 if regressions else 0
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "results": {key(r): {m: r.get(m) for m in METRICS + ("error",) if m in r} for r in results},
+            }, f, indent=2, sort_keys=True)
+        print("baseline written to %s" % args.baseline)
+    if any("error" in r for r in results):
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
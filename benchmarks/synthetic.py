@@ -0,0 +1,73 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Synthetic Yelp-shaped data for the benchmarks."""
+
+import numpy as np
+import pandas as pd
+
+# Roughly Franklin County, Ohio, the page's default geography.
+CENTER = (39.9698749, -83.0090858)
+
+
+def synthetic_businesses(n, seed=0, spread=0.25):
+    """n business dicts shaped like the `businesses` list of a Yelp search page."""
+    rng = np.random.default_rng(seed)
+    lats = rng.normal(CENTER[0], spread, n)
+    lons = rng.normal(CENTER[1], spread, n)
+    ratings = rng.integers(2, 11, n) / 2
+    counts = rng.integers(0, 5000, n)
+    distances = rng.uniform(0, 40000, n)
+    return [
+        {
+            'name': 'Business %d' % (i % 5000),
+            'coordinates': {'latitude': lats[i], 'longitude': lons[i]},
+            'rating': ratings[i],
+            'review_count': int(counts[i]),
+            'distance': distances[i],
+        }
+        for i in range(n)
+    ]
+
+
+def paginate(businesses, page_size=50):
+    """Split a list of businesses into API-sized pages."""
+    return [businesses[i:i + page_size] for i in range(0, len(businesses), page_size)]
+
+
+def synthetic_frame(n, seed=0, spread=0.25):
+    """n businesses as the typed frame get_businesses returns."""
+    from yelpmap.businesses import DTYPES
+
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'Name': np.array(['Business %d' % i for i in range(5000)], dtype=object)[np.arange(n) % 5000],
+        'Lat': rng.normal(CENTER[0], spread, n),
+        'Lon': rng.normal(CENTER[1], spread, n),
+        'Rating': rng.integers(2, 11, n) / 2,
+        'RatingCount': rng.integers(0, 5000, n),
+        'Distance': rng.uniform(0, 40000, n),
+    })
+    return frame.astype(DTYPES)
+
+
+def synthetic_agri(regions, years=range(1961, 2008), seed=0):
+    """An agri.csv-shaped wide frame: Region plus one column of dollars per year."""
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(20, 2, (regions, len(years))).cumsum(axis=1)
+    frame = pd.DataFrame(values, columns=[str(y) for y in years])
+    # The DataFrame demo preselects these two.
+    names = ['China', 'United States of America'] + ['Region %d' % i for i in range(2, regions)]
+    frame.insert(0, 'Region', names[:regions])
+    return frame
@@ -0,0 +1,145 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Julia set frames for the Animation demo.
+
+Each frame iterates z -> z*z + c over a fixed grid, but only over the points
+that have not escaped yet: active points live in compacted arrays (values
+plus their flat pixel index) that shrink every iteration, so late iterations
+touch a fraction of the grid. complex64 halves memory traffic at a small
+cost in precision. Whole animations are rendered on a process pool shared
+by the caller and kept in a small LRU keyed by their parameters.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+WIDTH, HEIGHT, SCALE = 960, 640, 400
+FRAMES = 100
+
+
+@lru_cache(maxsize=4)
+def grid(width=WIDTH, height=HEIGHT, scale=SCALE, dtype=np.complex128):
+    """Flat, read-only array of the starting points z0 of every pixel, row-major."""
+    x = np.linspace(-width / scale, width / scale, num=width, dtype=np.float64)
+    y = np.linspace(-height / scale, height / scale, num=height, dtype=np.float64)
+    z = (x[np.newaxis, :] + 1j * y[:, np.newaxis]).astype(dtype).ravel()
+    z.flags.writeable = False
+    return z
+
+
+def escape_counts(c, iterations, width=WIDTH, height=HEIGHT, scale=SCALE, dtype=np.complex128):
+    """
+    For every pixel, the last iteration i at which |z| <= 2 still held (0 if
+    it escaped on the first), as an (height, width) int array.
+    """
+    z = grid(width, height, scale, dtype).copy()
+    c = z.dtype.type(c)
+    index = np.arange(z.size, dtype=np.int32)
+    counts = np.zeros(z.size, dtype=np.int32)
+
+    for i in range(iterations):
+        np.multiply(z, z, out=z)
+        z += c
+        keep = z.real * z.real + z.imag * z.imag <= 4
+        z = z[keep]
+        index = index[keep]
+        counts[index] = i
+        if not index.size:
+            break
+    return counts.reshape(height, width)
+
+
+def julia_frame(c, iterations, width=WIDTH, height=HEIGHT, scale=SCALE, dtype=np.complex128):
+    """One frame as a uint8 grayscale image: 255 escaped at once, 0 never escaped."""
+    counts = escape_counts(c, iterations, width, height, scale, dtype)
+    top = counts.max() or 1
+    return (255 - counts * 255 // top).astype(np.uint8)
+
+
+def frame_constants(separation, frames=FRAMES):
+    """The c of every frame: separation * e^(ia) for a in [0, 4*pi]."""
+    return separation * np.exp(1j * np.linspace(0.0, 4 * np.pi, frames))
+
+
+def _render(job):
+    args, encode = job
+    frame = julia_frame(*args)
+    return frame if encode is None else encode(frame)
+
+
+def render_frames(iterations, separation, frames=FRAMES, pool=None, dtype=np.complex128, encode=None):
+    """
+    Yield the frames of an animation in order. pool, an executor (usually a
+    ProcessPoolExecutor shared across reruns), renders them in parallel;
+    frames are still yielded in order, as soon as each is ready. encode, a
+    picklable callable, is applied to each frame where it is rendered, so
+    workers send back encoded frames instead of pixel arrays.
+    """
+    jobs = [((c, iterations, WIDTH, HEIGHT, SCALE, dtype), encode) for c in frame_constants(separation, frames)]
+    if pool is None:
+        for job in jobs:
+            yield _render(job)
+        return
+    futures = [pool.submit(_render, job) for job in jobs]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # A rerun abandons the generator; drop its frames that haven't started
+        # so the shared pool moves on to the next animation.
+        for future in futures:
+            future.cancel()
+
+
+class FrameCache:
+    """Thread-safe LRU of finished animations (lists of frames), keyed by their parameters."""
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            frames = self._entries.get(key)
+            if frames is not None:
+                self._entries.move_to_end(key)
+            return frames
+
+    def put(self, key, frames):
+        with self._lock:
+            self._entries[key] = frames
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def frames(self, key, render):
+        """
+        Yield the cached frames for key, or the frames of render() as they
+        arrive, caching them once the animation has been rendered completely.
+        """
+        frames = self.get(key)
+        if frames is not None:
+            yield from frames
+            return
+        frames = []
+        for frame in render():
+            frames.append(frame)
+            yield frame
+        self.put(key, frames)
@@ -0,0 +1,133 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Delivery of animation frames to an st.empty() image placeholder.
+
+Frames are quantized to uint8 and encoded as palette PNGs (one byte per
+pixel plus a 768-byte palette, fast zlib level), which is a fraction of the
+size of the float arrays st.image would otherwise serialize. FramePacer
+holds delivery to a target frame rate and drops frames when sending falls
+behind. Streamlit doesn't report when the browser has drawn a frame, so
+"behind" is estimated from the time spent sending and from a byte budget
+standing in for the connection's bandwidth.
+"""
+
+import io
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+PALETTES = ("gray", "magma", "viridis", "twilight")
+
+EncodedFrame = namedtuple("EncodedFrame", "data seconds")
+
+
+@lru_cache(maxsize=None)
+def palette(name):
+    """The 256-entry RGB palette of a matplotlib colormap, as 768 bytes."""
+    if name == "gray":
+        return bytes(np.repeat(np.arange(256, dtype=np.uint8), 3))
+    import matplotlib
+
+    try:
+        cmap = matplotlib.colormaps[name]
+    except AttributeError:  # matplotlib < 3.5
+        cmap = matplotlib.cm.get_cmap(name)
+    return (cmap(np.linspace(0, 1, 256))[:, :3] * 255).round().astype(np.uint8).tobytes()
+
+
+def quantize(frame):
+    """uint8 frames pass through; floats in [0, 1] are scaled to 0-255."""
+    frame = np.asarray(frame)
+    if frame.dtype == np.uint8:
+        return frame
+    return (np.clip(frame, 0.0, 1.0) * 255).round().astype(np.uint8)
+
+
+class PNGEncoder:
+    """Picklable callable turning a frame into an EncodedFrame of palette-PNG bytes."""
+
+    def __init__(self, palette_name="gray", compress_level=1):
+        self.palette_name = palette_name
+        self.compress_level = compress_level
+
+    def __call__(self, frame):
+        start = time.perf_counter()
+        image = Image.fromarray(quantize(frame), mode="L")
+        image.putpalette(palette(self.palette_name))  # L -> P, one byte per pixel
+        out = io.BytesIO()
+        image.save(out, format="PNG", compress_level=self.compress_level)
+        return EncodedFrame(out.getvalue(), time.perf_counter() - start)
+
+
+class FramePacer:
+    """
+    Paces frames to at most `fps` per second. Each delivery costs the time it
+    took or nbytes / bandwidth, whichever is larger; when the cost exceeds the
+    frame interval the excess accumulates as debt, and frames are dropped
+    while the debt is more than one interval.
+    """
+
+    def __init__(self, fps=20.0, bandwidth=4e6, clock=time.perf_counter, sleep=time.sleep):
+        self.interval = 1.0 / fps
+        self.bandwidth = bandwidth
+        self.debt = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._start = None
+
+    def admit(self, force=False):
+        """True to deliver the next frame now (after pacing), False to drop it."""
+        if self.debt > self.interval and not force:
+            self.debt -= self.interval
+            return False
+        if self._start is not None:
+            wait = self.interval - (self._clock() - self._start)
+            if wait > 0:
+                self._sleep(wait)
+        self._start = self._clock()
+        return True
+
+    def delivered(self, nbytes):
+        """Record that the admitted frame, nbytes long, has been sent."""
+        cost = max(self._clock() - self._start, nbytes / self.bandwidth)
+        self.debt = max(0.0, self.debt + cost - self.interval)
+
+
+class DeliveryStats:
+    def __init__(self):
+        self.sent = 0
+        self.dropped = 0
+        self.bytes = 0
+        self.encode_seconds = 0.0
+        self._started = time.perf_counter()
+
+    def record(self, frame):
+        self.sent += 1
+        self.bytes += len(frame.data)
+        self.encode_seconds += frame.seconds
+
+    def drop(self):
+        self.dropped += 1
+
+    def summary(self):
+        elapsed = time.perf_counter() - self._started
+        sent = max(1, self.sent)
+        return "%d frames sent, %d dropped | %.1f ms encode, %.1f kB per frame | %.1f fps" % (
+            self.sent, self.dropped, 1000 * self.encode_seconds / sent,
+            self.bytes / sent / 1000, self.sent / elapsed if elapsed else 0)
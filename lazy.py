@@ -0,0 +1,73 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deferred imports for heavy optional stacks.
+
+lazy_import(name) returns a stand-in for the module that imports it on the
+first attribute access, so a page can name folium or altair at the top but
+only pay for the import on the code path that uses it. How long each
+deferred import took is kept for the startup profiler.
+"""
+
+import importlib
+import sys
+import threading
+import time
+
+_load_times = {}
+_lock = threading.Lock()
+
+
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            name = self.__dict__["_name"]
+            loaded = name in sys.modules
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            if not loaded:
+                with _lock:
+                    _load_times.setdefault(name, time.perf_counter() - start)
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return "<lazy module %r (%s)>" % (self.__dict__["_name"], state)
+
+
+def lazy_import(name):
+    """A LazyModule for name (dotted names are fine), or the module if already imported."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def load_times():
+    """{module: seconds} for the deferred imports that have happened in this process."""
+    with _lock:
+        return dict(_load_times)
@@ -0,0 +1,284 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-rerun instrumentation for the demo pages.
+
+A page calls start_run() once its controls are drawn, wraps hot paths in
+`with span("fetch"):` and ends with finish_run(). Each span records its
+wall time, the change in process RSS over it, and how deeply it is nested.
+finish_run() adds the hit rates of the registered caches, logs a summary,
+and exports the run. The export is one JSON line appended to
+$APP_METRICS_FILE (default files/metrics.jsonl). If that path ends in
+.prom, the file is instead rewritten as running Prometheus totals, for a
+node_exporter textfile collector.
+
+Recording is on for every session when $APP_METRICS is set. Otherwise it
+is on only for the sessions that tick the sidebar panel. While it is off
+everywhere, span() costs one check and returns a shared no-op context
+manager. A session's current Run lives in its session state, so it goes
+away with the session.
+
+Stages a page reuses from an earlier rerun (pipeline futures) don't run
+again, so their spans can't be recorded live. add_stages() adds the
+timings the pipeline kept for them, marked as from an earlier run.
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+import weakref
+
+import streamlit as st
+
+from Hello import LOGGER
+from yelpmap.atomic import atomic_path
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # streamlit < 1.18
+    from streamlit.scriptrunner import get_script_run_ctx
+
+METRICS_FILE = os.environ.get("APP_METRICS_FILE", os.path.join("files", "metrics.jsonl"))
+
+_RUN_KEY = "_metrics_run"
+
+_enabled = bool(os.environ.get("APP_METRICS"))
+_active = weakref.WeakSet()  # current Runs; they die with their session's state
+_caches = {}  # name -> callable returning a CacheStats-style dict
+_totals = collections.defaultdict(lambda: [0, 0.0])  # span name -> [count, seconds]
+_run_count = 0
+_lock = threading.Lock()
+_local = threading.local()
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def _rss():
+    """Resident set size of the process in bytes (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource  # not on Windows, where /proc is missing too
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _current_run():
+    """The Run in the session state of the calling script (or pipeline) thread."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    try:
+        return ctx.session_state[_RUN_KEY]
+    except KeyError:
+        return None
+
+
+class Run:
+    """The spans recorded for one rerun of a page in one session."""
+
+    def __init__(self, page, session):
+        self.page = page
+        self.session = session
+        self.started = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def as_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "time": self.started,
+            "page": self.page,
+            "session": self.session,
+            "seconds": time.time() - self.started,
+            "spans": spans,
+        }
+
+
+class _Span:
+    __slots__ = ("run", "name", "depth", "rss", "start")
+
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.rss = _rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _local.depth = self.depth
+        self.run.add({
+            "name": self.name,
+            "seconds": seconds,
+            "rss_delta": _rss() - self.rss,
+            "depth": self.depth,
+            "thread": threading.current_thread().name,
+        })
+        with _lock:
+            total = _totals[self.name]
+            total[0] += 1
+            total[1] += seconds
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Context manager timing a block as part of the current session's run."""
+    if not (_enabled or _active):
+        return _NO_SPAN
+    run = _current_run()
+    if run is None:
+        return _NO_SPAN
+    return _Span(run, name)
+
+
+def start_run(page, show=False):
+    """
+    Start recording this session's rerun of page. show is whether the
+    session has the panel on, which turns recording on for it.
+    """
+    state = st.session_state
+    if _enabled or show:
+        run = Run(page, get_script_run_ctx().session_id)
+        state[_RUN_KEY] = run
+        _active.add(run)
+    elif _RUN_KEY in state:
+        del state[_RUN_KEY]
+
+
+def add_stages(timings):
+    """
+    Add pipeline stage timings ({name: (started, seconds)}, started as
+    time.time()) to this session's run as top-level "stage" spans.
+    """
+    run = _current_run()
+    if run is None:
+        return
+    for name, (started, seconds) in timings.items():
+        earlier = started < run.started
+        run.add({
+            "name": "stage " + name,
+            "seconds": seconds,
+            "rss_delta": None,
+            "depth": 0,
+            "thread": "pipeline",
+            "earlier_run": earlier,
+        })
+        if not earlier:
+            with _lock:
+                total = _totals["stage " + name]
+                total[0] += 1
+                total[1] += seconds
+
+
+def register_cache(name, stats):
+    """Report stats() (a dict with hits, misses and hit_rate) with every run."""
+    _caches[name] = stats
+
+
+def finish_run():
+    """Finish, log and export this session's run. Returns its record, or None if not recording."""
+    run = _current_run()
+    if run is None:
+        return None
+    record = run.as_dict()
+    record["caches"] = {name: stats() for name, stats in list(_caches.items())}
+    LOGGER.info("%s rerun in %.0f ms: %s", record["page"], 1000 * record["seconds"], ", ".join(
+        "%s %.0f ms" % (s["name"], 1000 * s["seconds"]) for s in record["spans"] if s["depth"] == 0))
+    try:
+        _export(record)
+    except OSError as e:
+        LOGGER.warning("Could not write metrics to %s: %s", METRICS_FILE, e)
+    return record
+
+
+def _export(record, path=None):
+    global _run_count
+    path = path or METRICS_FILE
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    with _lock:
+        _run_count += 1
+        if not path.endswith(".prom"):
+            with open(path, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+            return
+        text = prometheus_text(record["caches"])
+        with atomic_path(path) as tmp_path, open(tmp_path, "w") as f:
+            f.write(text)
+
+
+def prometheus_text(caches):
+    """Span totals, run count and cache counters in the Prometheus text format (call under _lock)."""
+    lines = [
+        "# HELP app_span_seconds Time spent in instrumented spans.",
+        "# TYPE app_span_seconds summary",
+    ]
+    for name, (count, seconds) in sorted(_totals.items()):
+        lines.append('app_span_seconds_sum{span="%s"} %f' % (name, seconds))
+        lines.append('app_span_seconds_count{span="%s"} %d' % (name, count))
+    lines += ["# TYPE app_runs_total counter", "app_runs_total %d" % _run_count]
+    for field in ("hits", "misses"):
+        lines.append("# TYPE app_cache_%s_total counter" % field)
+        lines += ['app_cache_%s_total{cache="%s"} %d' % (field, name, stats[field]) for name, stats in sorted(caches.items())]
+    lines.append("# TYPE app_cache_hit_ratio gauge")
+    lines += ['app_cache_hit_ratio{cache="%s"} %f' % (name, stats["hit_rate"]) for name, stats in sorted(caches.items())]
+    return "\n".join(lines) + "\n"
+
+
+def sidebar_panel(record):
+    """Show a finished run's spans and cache hit rates in the sidebar."""
+    if record is None:
+        return
+    with st.sidebar.expander("Timings", expanded=True):
+        st.caption("Rerun: %.0f ms" % (1000 * record["seconds"]))
+        st.dataframe(
+            [{
+                "span": " " * s["depth"] + s["name"],
+                "ms": round(1000 * s["seconds"], 1),
+                "RSS Δ MB": None if s["rss_delta"] is None else round(s["rss_delta"] / 1e6, 1),
+                "earlier run": s.get("earlier_run", False),
+            } for s in record["spans"]],
+            use_container_width=True,
+        )
+        for name, stats in record["caches"].items():
+            st.caption("%s cache: %.0f%% hits (%d hits, %d misses)"
+                       % (name, 100 * stats["hit_rate"], stats["hits"], stats["misses"]))
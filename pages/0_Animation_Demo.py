@@ -12,13 +12,37 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 
 import streamlit as st
 from streamlit.hello.utils import show_code
 
+from fractal import FRAMES, FrameCache, render_frames
+from frame_delivery import PALETTES, DeliveryStats, FramePacer, PNGEncoder
+from startup import PageTimer
+
+timer = PageTimer("Animation Demo")
+
+
+@st.cache_resource
+def frame_cache():
+    """Finished animations, shared by all sessions so a "Re-run" replays them."""
+    return FrameCache(max_entries=4)
+
+
+@st.cache_resource
+def render_pool():
+    """
+    One process pool for every animation, instead of a new one per render.
+    Workers don't fork from the multi-threaded server, which can deadlock.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(method))
+
 
 def animation_demo() -> None:
 
@@ -26,6 +50,9 @@ def animation_demo() -> None:
     # This gives you an extremely simple interaction model.
     iterations = st.sidebar.slider("Level of detail", 2, 20, 10, 1)
     separation = st.sidebar.slider("Separation", 0.7, 2.0, 0.7885)
+    single = st.sidebar.checkbox("Single precision (faster)", False)
+    dtype = np.complex64 if single else np.complex128
+    palette = st.sidebar.selectbox("Palette", PALETTES)
 
     # Non-interactive elements return a placeholder to their location
     # in the app. Here we're storing progress_bar to update it later.
@@ -36,33 +63,35 @@ def animation_demo() -> None:
     frame_text = st.sidebar.empty()
     image = st.empty()
 
-    m, n, s = 960, 640, 400
-    x = np.linspace(-m / s, m / s, num=m).reshape((1, m))
-    y = np.linspace(-n / s, n / s, num=n).reshape((n, 1))
-
-    for frame_num, a in enumerate(np.linspace(0.0, 4 * np.pi, 100)):
+    # Frames are rendered and PNG-encoded on a process pool and cached, so
+    # changing nothing and pressing "Re-run" replays the animation without
+    # recomputing it.
+    frames = frame_cache().frames(
+        (iterations, separation, single, palette),
+        lambda: render_frames(iterations, separation, FRAMES, pool=render_pool(),
+                              dtype=dtype, encode=PNGEncoder(palette)))
+
+    # The pacer caps the frame rate and drops frames when sending falls behind.
+    pacer = FramePacer(fps=20)
+    stats = DeliveryStats()
+    for frame_num, frame in enumerate(frames):
         # Here were setting value for these two elements.
         progress_bar.progress(frame_num)
-        frame_text.text("Frame %i/100" % (frame_num + 1))
-
-        # Performing some fractal wizardry.
-        c = separation * np.exp(1j * a)
-        Z = np.tile(x, (n, 1)) + 1j * np.tile(y, (1, m))
-        C = np.full((n, m), c)
-        M: Any = np.full((n, m), True, dtype=bool)
-        N = np.zeros((n, m))
-
-        for i in range(iterations):
-            Z[M] = Z[M] * Z[M] + C[M]
-            M[np.abs(Z) > 2] = False
-            N[M] = i
+        frame_text.text("Frame %i/%i" % (frame_num + 1, FRAMES))
 
+        if not pacer.admit(force=frame_num == FRAMES - 1):
+            stats.drop()
+            continue
         # Update the image placeholder by calling the image() function on it.
-        image.image(1.0 - (N / N.max()), use_column_width=True)
+        image.image(frame.data, use_column_width=True)
+        pacer.delivered(len(frame.data))
+        stats.record(frame)
+        timer.rendered()
 
     # We clear elements by calling empty on them.
     progress_bar.empty()
     frame_text.empty()
+    st.sidebar.caption(stats.summary())
 
     # Streamlit widgets automatically run the script from top to bottom. Since
     # this button is not connected to any other logic, it just causes a plain
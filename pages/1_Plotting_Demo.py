@@ -19,21 +19,31 @@ import numpy as np
 import streamlit as st
 from streamlit.hello.utils import show_code
 
+from startup import PageTimer
+from streaming_chart import StreamingChart
+
+timer = PageTimer("Plotting Demo")
+
 
 def plotting_demo():
     progress_bar = st.sidebar.progress(0)
     status_text = st.sidebar.empty()
-    last_rows = np.random.randn(1, 1)
-    chart = st.line_chart(last_rows)
+    refresh = st.sidebar.slider("Chart refresh (s)", 0.05, 1.0, 0.25)
+
+    # The chart keeps a bounded window and redraws it at most every `refresh`
+    # seconds, so memory and per-update cost stay flat however long it runs.
+    chart = StreamingChart(st.empty(), capacity=10_000, max_points=1_000, flush_interval=refresh)
+    chart.push(np.random.randn(1, 1))
+    timer.rendered()
 
     for i in range(1, 101):
-        new_rows = last_rows[-1, :] + np.random.randn(5, 1).cumsum(axis=0)
+        new_rows = chart.last() + np.random.randn(5, 1).cumsum(axis=0)
         status_text.text("%i%% Complete" % i)
-        chart.add_rows(new_rows)
+        chart.push(new_rows)
         progress_bar.progress(i)
-        last_rows = new_rows
         time.sleep(0.05)
 
+    chart.flush(force=True)
     progress_bar.empty()
 
     # Streamlit widgets automatically run the script from top to bottom. Since
@@ -13,69 +13,74 @@
 # limitations under the License.
   
 
-from urllib.error import URLError
-from urllib.request import urlopen
-import zipfile
-from io import BytesIO
-import json
-import requests
-import pandas as pd
-from numpy import linalg
-import matplotlib.pyplot as plt
-import matplotlib
-import shapely
-
-import geopandas as gpd
-import folium
-import contextily
-from folium.plugins import HeatMap
-from streamlit_folium import st_folium
-import h3 as h3
-from geojson import Feature, Point, FeatureCollection
-from shapely.geometry import shape
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import streamlit as st
+import streamlit.components.v1 as components
 from streamlit.hello.utils import show_code
-from streamlit_folium import folium_static
 
-def get_businesses(location, term, api_key):
+import metrics
+import yelpmap
+from lazy import lazy_import
+from startup import PageTimer
+from yelpmap.cache import TieredCache
+from yelpmap.pipeline import session_pipeline
+
+# The geo and plotting stacks (geopandas, shapely, h3, folium, matplotlib)
+# load on first use, mostly on pipeline workers after the page has drawn.
+folium = lazy_import("folium")
+folium_plugins = lazy_import("folium.plugins")
+streamlit_folium = lazy_import("streamlit_folium")
+
+timer = PageTimer("Mapping Demo")
+
+@st.cache_resource
+def yelp_client(api_key):
+    """One pooled, rate-limited Yelp client per API key, shared across reruns."""
+    return yelpmap.yelp.YelpClient(api_key)
+
+
+@st.cache_resource
+def aggregate_store():
+    """Results written by the offline batch job (python -m yelpmap.precompute)."""
+    return yelpmap.store.AggregateStore()
+
+
+@st.cache_resource
+def business_cache():
+    """
+    Search results shared by every session: memory LRU in front of a disk store.
+    Results are fresh for 6 hours and served stale (while refetching) for a day.
+    """
+    cache = TieredCache(directory=os.path.join(yelpmap.DATA_DIR, 'cache', 'businesses'),
+                        ttl=6 * 3600, stale_ttl=24 * 3600, max_entries=256)
+    metrics.register_cache("businesses", cache.stats.as_dict)
+    return cache
+
+
+def get_businesses(location, term, api_key, max_results=None, cancelled=None):
     """
     Uses YelpAPI to pull up to 1000 businesses, Lat/Lon, Avg Rating, and   
     Number of Ratings (plus distance, but we aren't using that).  
-
+    Pages are fetched concurrently through the shared client and turned
+    into typed columns as they arrive. Results are cached per (location, term).
+    A set cancelled event aborts the fetch (with nothing cached).
     """
-    headers = {'Authorization': 'Bearer %s' % api_key}
-    url = 'https://api.yelp.com/v3/businesses/search'
-
-    data = [] 
-    for offset in range(0, 100, 50): # Changed to 100 to limit API rate-limiting
-        params = {
-            'limit': 50, 
-            'location': location.replace(' ', '+'),
-            'term': term.replace(' ', '+'),
-            'offset': offset
-        }
-
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            data += response.json()['businesses']
-        elif response.status_code == 400:
-            print('400 Bad Request')
-            break
-
-    result_df = pd.DataFrame({'Name': [], 'Lat': [], 'Lon':[], 'Rating':[], 'RatingCount':[], 'Distance':[]})
-    listdic = []
-    for result in data:
-        name = result['name']
-        lat = result['coordinates']['latitude']
-        lon = result['coordinates']['longitude']
-        rating = result['rating']
-        ratingcount = result['review_count']
-        distance = result['distance']
-        listdic=pd.Series([name,lat,lon,rating,ratingcount,distance], index=['Name', 'Lat','Lon', 'Rating', 'RatingCount', 'Distance'])
-        result_df=pd.concat([result_df, listdic.to_frame().T], ignore_index=True)
-
-    return result_df
+    max_results = max_results or yelpmap.yelp.MAX_RESULTS
+
+    def fetch():
+        pages = yelp_client(api_key).iter_pages(location, term, max_results, cancelled)
+        return yelpmap.businesses.businesses_to_frame(pages)
+
+    with metrics.span("fetch"):
+        stored = aggregate_store().businesses(location, term)
+        if stored is not None:
+            return stored
+
+        key = (' '.join(location.lower().split()), ' '.join(term.lower().split()), max_results)
+        return business_cache().get_or_compute(key, fetch)
 
 
 def MapYelps(df):
@@ -88,67 +93,30 @@ def MapYelps(df):
   ne = [df.Lat.max(), df.Lon.max()]
   m.fit_bounds([sw,ne])
 
-  #Create a layer, add points to it, then add the layer to your map
-  Locations = folium.FeatureGroup(name = "Locations")
-  for index, row in df.iterrows():
-    html = '''
-    <b>Name:</b> {name} <br>
-    <b>Rating:</b> {rating}
-    '''.format(name = row.Name, rating=row.Rating)
-
-    iframe = folium.IFrame(html)
-    popup = folium.Popup(iframe,
-                        min_width=200,
-                        max_width=120)
-
-    Locations.add_child(folium.Marker(location=[row.Lat,row.Lon], popup = popup))
-  m.add_child(Locations)
+  #Create a clustered layer holding all points, then add the layer to your map
+  m.add_child(yelpmap.markers.marker_layer(df, name = "Locations"))
   
   #Add ability to turn off/on your layers
   folium.LayerControl().add_to(m)
   
-  return(st_folium(m, width=700, height=450))
+  return(streamlit_folium.st_folium(m, width=700, height=450))
 
 
 def Hexify(df, resolution=7):
   """
   Hexify will just add a column to the input df that gives the HEX ID for each point in the dataset.
   DF must include columns "Lat" and "Lon". 
+  Indexing runs on the whole Lat/Lon arrays at once; large frames are split across cores.
   """
-  hex_ids = df.apply(lambda row: h3.geo_to_h3(row.Lat, row.Lon, resolution), axis = 1)
-  df_result = df.assign(hex_id=hex_ids.values)
-  return df_result
+  return yelpmap.hexes.hexify(df, resolution, workers=os.cpu_count())
 
 
-def hex_df_to_geojson(df_hex, column_name = "value"):
-    """
-    Produce the GeoJSON for a dataframe, constructing the geometry from the "hex_id" column
-    and with a property matching the one in column_name
-    """    
-    list_features = []
-    
-    for i,row in df_hex.iterrows():
-        try:
-            geometry_for_row = { "type" : "Polygon", "coordinates": [h3.h3_to_geo_boundary(h=row["hex_id"],geo_json=True)]}
-            feature = Feature(geometry = geometry_for_row , id=row["hex_id"], properties = {column_name : row[column_name]})
-            list_features.append(feature)
-        except:
-            print("An exception occurred for hex " + row["hex_id"]) 
-
-    feat_collection = FeatureCollection(list_features)
-    geojson_result = json.dumps(feat_collection)
-    return geojson_result
-
-def get_color(custom_cm, val, vmin, vmax):
-    """
-    Scales the color gradient to your specific data range
-    """
-    return matplotlib.colors.to_hex(custom_cm((val-vmin)/(vmax-vmin)))
-
-def choropleth_map(df_aggreg, column_name = "value", border_color = 'black', fill_opacity = 0.7, color_map_name = "Blues", initial_map = None, zoom=7):  
+def choropleth_map(df_aggreg, column_name = "value", border_color = 'black', fill_opacity = 0.7, color_map_name = "Blues", initial_map = None, zoom=7, scheme = "linear", n_bins = None):  
     """
     This is a somewhat complicated route to creating a choropleth only lightly edited from online.  
     Below, I use Folium's built-in choropleth capabilities, and I believe it's much simpler to understand. 
+    Colors are assigned to all cells up front and stored in each feature's fill_color property.
+    scheme can be 'linear', 'quantile' or 'log' (see yelpmap.colors.assign_colors).
     """
     #colormap
     min_value = df_aggreg[column_name].min()
@@ -163,16 +131,18 @@ def choropleth_map(df_aggreg, column_name = "value", border_color = 'black', fil
     if initial_map is None:
         initial_map = folium.Map(location= [+39.9698749,	-083.0090858], zoom_start=zoom, tiles="cartodbpositron")
 
-    #create geojson data from dataframe
-    geojson_data = hex_df_to_geojson(df_hex = df_aggreg, column_name = column_name)
-
     # color_map_name 'Blues' for now, many more at https://matplotlib.org/stable/tutorials/colors/colormaps.html to choose from!
-    custom_cm = matplotlib.cm.get_cmap(color_map_name)
+    with metrics.span("colormap"):
+        fill_colors = yelpmap.colors.assign_colors(df_aggreg[column_name].values, color_map_name, scheme, n_bins)
+
+    #create geojson data from dataframe
+    with metrics.span("geojson"):
+        geojson_data = yelpmap.hexjson.hex_df_to_geojson(df_hex = df_aggreg.assign(fill_color=fill_colors), column_name = column_name, columns = ['fill_color'])
 
     folium.GeoJson(
         geojson_data,
         style_function=lambda feature: {
-            'fillColor': get_color(custom_cm, feature['properties'][column_name], vmin=min_value, vmax=max_value),
+            'fillColor': feature['properties']['fill_color'],
             'color': border_color,
             'weight': 1,
             'fillOpacity': fill_opacity 
@@ -182,108 +152,160 @@ def choropleth_map(df_aggreg, column_name = "value", border_color = 'black', fil
 
     return initial_map
 
-myzip = zipfile.ZipFile(BytesIO(urlopen("https://www2.census.gov/geo/tiger/TIGER2022/COUNTY/tl_2022_us_county.zip").read()))
+@st.cache_resource
+def county_store():
+    """
+    County boundaries, shared by every session. The TIGER zip is only downloaded
+    and converted the first time; afterwards this just opens the local store.
+    """
+    return yelpmap.counties.CountyStore().open()
+
+
+@st.cache_resource(max_entries=32)
+def hex_pyramid(df):
+  """
+  Hex counts (and Rating/RatingCount sums and means) of df at every resolution 5-9,
+  indexed once and shared across reruns, so changing res only reads another level.
+  """
+  with metrics.span("hexify"):
+    return yelpmap.pyramid.HexPyramid.from_frame(df, workers=os.cpu_count())
 
 
-myzip.extractall(path='files/')
+@st.cache_resource(max_entries=8)
+def local_summary(path, mtime):
+  """
+  Hex pyramid, county aggregates and a row sample of a local CSV/Parquet file,
+  streamed in chunks so memory stays bounded. mtime is only part of the key,
+  to pick up edits.
+  """
+  with metrics.span("hexify (stream)"):
+    return yelpmap.sources.stream_summary(yelpmap.sources.open_source(path), geometries=county_lod())
 
-usa = gpd.read_file(r'files/tl_2022_us_county.shp')
 
+@st.cache_resource
+def county_lod():
+  """County and pre-dissolved state outlines at several levels of detail."""
+  return yelpmap.simplify.GeometryLOD(county_store()).open()
 
 
-def poly_geojson(poly):
-  poly_geojson = gpd.GeoSeries(poly).__geo_interface__
-  poly_geojson = poly_geojson['features'][0]['geometry'] 
-  return poly_geojson
+@st.cache_resource
+def coverage_store():
+  """Hex coverage of counties/states, built in bulk and saved per (code, res)."""
+  return yelpmap.coverage.CoverageStore(county_lod())
 
 
-def MapYelps_allinone(df, markers = True, HexHeat = 'Hex', res = 8, zoom = 9, fillGeom=False):
+def MapYelps_allinone(df, markers = True, HexHeat = 'Hex', res = 8, zoom = 9, fillGeom=False, pyramid=None, counties=None, bounds=None):
   """
   df should be data frame containing at least columns named Lat and Lon. For Markers, want "Name" and "Rating" too. 
-  HexHeat should be set to 'Hex' or 'Heat'. Any other value will not return a layer.
+  HexHeat should be set to 'Hex', 'Heat' or 'County'. Any other value will not return a layer.
+  'County' shades each county by its business count, with the mean rating in the tooltip.
   res determines size of hexagons. 8 is a good starting point for county-level work.
   zoom is the starting zoom level *if* you are not using markers = True. If using markers = True, then it will use a boundary box based on marker locations. 
   fillGeom: When HexHeat=Hex, this determines whether you fill an outer polygon with ALL polygons. Use 5-digit state+county FIPS code or 2-digit state code. 
+  pyramid: precomputed HexPyramid for the hex layers (e.g. streamed from a local file, where df is only a sample).
+  counties, bounds: precomputed county_aggregates and (minx, miny, maxx, maxy) of all points, for the same reason.
   """  
-  if 'map' not in st.session_state or st.session_state.map is None:
-    f = folium.Figure(width=800, height=400)
-
-    if (markers==True):
-      m=folium.Map(tiles='CartoDB positron', control=False).add_to(f)
-      sw = [df.Lat.min(), df.Lon.min()]
-      ne = [df.Lat.max(), df.Lon.max()]
-      m.fit_bounds([sw,ne])
-      Locations = folium.FeatureGroup(name = "Locations")
-
-      for index, row in df.iterrows():
-        html = '''
-        <b>Name:</b> {name} <br>
-        <b>Rating:</b> {rating}
-        '''.format(name = row.Name, rating=row.Rating)
-
-        iframe = folium.IFrame(html)
-        popup = folium.Popup(iframe,
-                            min_width=200,
-                            max_width=120)
-
-        Locations.add_child(folium.Marker(location=[row.Lat,row.Lon], popup = popup))
-      m.add_child(Locations)
-    if (markers!=True):
-      m=folium.Map(tiles='CartoDB positron', control=False, location = [df.Lat.mean(),df.Lon.mean()], zoom_start=zoom).add_to(f)
-    if (HexHeat == 'Heat'):
-      points=df[['Lat','Lon']].values.tolist()
-      HeatMap(points, name="Heatmap").add_to(m)
-
-    if (HexHeat == 'Hex'):
-      hexed = Hexify(df, resolution = res)
-      df_aggreg=hexed.groupby(['hex_id']).size().reset_index(name='counts')
-      if (fillGeom==False):
-        choropleth_map(df_aggreg, 'counts', zoom=zoom, initial_map=m)
-      if (fillGeom!=False):
-        if fillGeom==True:
-          fillGeom='39049'
-        if len(fillGeom)==5:
-          fillpoly=poly_geojson(usa.geometry[usa.GEOID==fillGeom])
-        elif len(fillGeom)==2:
-          fillpoly=poly_geojson(usa.geometry[usa.STATEFP==fillGeom].unary_union)
-        fillhexes=h3.polyfill_geojson(fillpoly,res)
-        h3_df = pd.DataFrame([],columns=['h3_id','h3_geo_boundary'])
-        for h3_hex in fillhexes:
-          h3_geo_boundary = shapely.geometry.Polygon(
-              h3.h3_to_geo_boundary(h3_hex,geo_json=True)
-          )
-          h3_df.loc[len(h3_df)]=[
-                        h3_hex,
-                        h3_geo_boundary
-                    ]
-        geoms = [shape(i) for i in h3_df.h3_geo_boundary]
-        fillgpd = gpd.GeoDataFrame({'hex_id':h3_df.h3_id,'geometry':geoms})
-        fillgpd.crs='EPSG:4269'
-
-        folium.Choropleth(
-            geo_data=fillgpd,
-            name="choropleth",
-            data=df_aggreg,
-            columns=["hex_id", "counts"],
-            key_on="feature.properties.hex_id",
-            fill_color="Blues",
-            fill_opacity=0.7,
-            line_opacity=0.02,
-            legend_name="Restaurant Counts",
-            nan_fill_opacity = .05
-        ).add_to(m)
-
-
-    folium.LayerControl().add_to(m)
-
-    st.session_state.map = m
-  
-  return(st.session_state.map)
+  f = folium.Figure(width=800, height=400)
+
+  if (markers==True):
+    m=folium.Map(tiles='CartoDB positron', control=False).add_to(f)
+    sw = [df.Lat.min(), df.Lon.min()]
+    ne = [df.Lat.max(), df.Lon.max()]
+    m.fit_bounds([sw,ne])
+    m.add_child(yelpmap.markers.marker_layer(df, name = "Locations"))
+  if (markers!=True):
+    m=folium.Map(tiles='CartoDB positron', control=False, location = [df.Lat.mean(),df.Lon.mean()], zoom_start=zoom).add_to(f)
+  if (HexHeat == 'Heat'):
+    # Bin server-side: the layer carries one weighted point per grid cell, not per business.
+    with metrics.span("density"):
+      cells=yelpmap.density.density_cells(df.Lat.values, df.Lon.values, zoom=zoom, sigma=1)
+    folium_plugins.HeatMap(cells, name="Heatmap").add_to(m)
+
+  if (HexHeat == 'Hex'):
+    df_aggreg = (pyramid if pyramid is not None else hex_pyramid(df)).level(res)
+    if (fillGeom==False):
+      choropleth_map(df_aggreg, 'counts', zoom=zoom, initial_map=m)
+    if (fillGeom!=False):
+      if fillGeom==True:
+        fillGeom='39049'
+      with metrics.span("coverage"):
+        fillgpd = coverage_store().get(fillGeom, res)
+
+      folium.Choropleth(
+          geo_data=fillgpd,
+          name="choropleth",
+          data=df_aggreg,
+          columns=["hex_id", "counts"],
+          key_on="feature.properties.hex_id",
+          fill_color="Blues",
+          fill_opacity=0.7,
+          line_opacity=0.02,
+          legend_name="Restaurant Counts",
+          nan_fill_opacity = .05
+      ).add_to(m)
+
+  if (HexHeat == 'County'):
+    lod = county_lod()
+    if counties is not None:
+      df_county = counties
+    else:
+      with metrics.span("county join"):
+        df_county = yelpmap.spatial_join.county_aggregates(df, lod)
+    if bounds is None:
+      bounds = (df.Lon.min(), df.Lat.min(), df.Lon.max(), df.Lat.max())
+    # Join on full detail, but draw outlines simplified to the zoom level.
+    outlines = lod.bbox(*bounds, yelpmap.simplify.level_for_zoom(zoom))
+    outlines = outlines[['GEOID', 'NAME', 'geometry']].merge(df_county, on='GEOID')
+    county_layer = folium.Choropleth(
+        geo_data=outlines,
+        name="choropleth",
+        data=df_county,
+        columns=["GEOID", "counts"],
+        key_on="feature.properties.GEOID",
+        fill_color="Blues",
+        fill_opacity=0.7,
+        line_opacity=0.3,
+        legend_name="Restaurant Counts"
+    ).add_to(m)
+    county_layer.geojson.add_child(folium.GeoJsonTooltip(fields=[c for c in ['NAME', 'counts', 'mean_rating'] if c in outlines]))
+
+  folium.LayerControl().add_to(m)
+
+  return m
+
+@st.cache_resource
+def map_cache():
+    """Rendered maps shared by every session, keyed on the data and all map parameters."""
+    cache = yelpmap.mapcache.MapCache()
+    metrics.register_cache("maps", cache.stats.as_dict)
+    metrics.register_cache("hex boundaries", yelpmap.hexjson.boundary_cache.stats.as_dict)
+    return cache
+
+
+def map_html(df, markers = True, HexHeat = 'Hex', res = 8, zoom = 9, fillGeom=False, pyramid=None, source=None,
+             counties=None, bounds=None):
+    def build():
+        with metrics.span("map build"):
+            return MapYelps_allinone(df, markers, HexHeat, res, zoom, fillGeom, pyramid, counties, bounds)
+
+    # "map" covers the cache lookup, and on a miss the build plus rendering it to HTML.
+    with metrics.span("map"):
+        return map_cache().html(
+            df, build,  # Get or create the map
+            markers=markers, HexHeat=HexHeat, res=res, zoom=zoom, fillGeom=fillGeom, source=source)
+
+
+def show_map(df, markers = True, HexHeat = 'Hex', res = 8, zoom = 9, fillGeom=False, pyramid=None, source=None,
+             counties=None, bounds=None):
+    components.html(map_html(df, markers, HexHeat, res, zoom, fillGeom, pyramid, source, counties, bounds),
+                    width=700, height=450)
+
+
+@st.cache_resource
+def pipeline_executor():
+    """Thread pool shared by every session for the page's background stages."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="mapping")
 
-def show_map(df, markers = True, HexHeat = 'Hex', res = 8, zoom = 9, fillGeom=False):
-    m = MapYelps_allinone(df, markers, HexHeat, res, zoom, fillGeom)  # Get or create the map
-    st_folium(m, width=700, height=450)
-    
 
 st.set_page_config(page_title="Mapping Demo", page_icon="🌍")
 st.markdown("# Mapping Demo")
@@ -294,13 +316,96 @@ st.write(
 to display geospatial data. It should now show an updated YELP map"""
 )
 
-Geog = st.text_input("Search Geography", "Columbus, Ohio")
-Query = st.text_input("Search Query", "barbecue")
-
-test = get_businesses(Geog, Query, st.secrets["YelpAPIKey"])
-st.write(test)
+source_kind = st.sidebar.radio("Data source", ["Yelp API", "Local file"])
+res = st.sidebar.slider("Hex resolution", 5, 9, 7)
+aggregate = st.sidebar.radio("Aggregate by", ["Hex", "County"])
+show_metrics = st.sidebar.checkbox("Show timings", False)
+metrics.start_run("Mapping Demo", show_metrics)
+
+fill = '39049'
+if source_kind == "Local file":
+  name = st.text_input("CSV or Parquet file in %s with Lat/Lon (and Name/Rating) columns"
+                       % yelpmap.sources.LOCAL_DIR, "")
+  if not name:
+    st.stop()
+  # Visitors may only read files from the data directory.
+  try:
+    path = yelpmap.sources.local_path(name)
+    inputs = ('file', path, os.path.getmtime(path))
+  except (ValueError, OSError) as e:
+    st.error(e)
+    st.stop()
+else:
+  Geog = st.text_input("Search Geography", "Columbus, Ohio")
+  Query = st.text_input("Search Query", "barbecue")
+  inputs = ('yelp', Geog, Query)
+
+# Changing any input cancels the previous run's stages that are still pending.
+pipe = session_pipeline(st.session_state, pipeline_executor(), inputs + (res, aggregate))
+# Boundaries and hex coverage don't depend on the businesses, so they load while those are fetched.
+pipe.submit('boundaries', lambda: coverage_store().get(fill, res))
+if source_kind == "Local file":
+  data = pipe.submit('data', local_summary, path, inputs[2])
+else:
+  data = pipe.submit('data', get_businesses, Geog, Query, st.secrets["YelpAPIKey"], cancelled=pipe.cancelled)
+
+table_slot = st.empty()
+map_slot = st.empty()
+status = st.empty()
+started = time.perf_counter()
+
+def tick(what):
+  # Touching the page is what lets a rerun for new inputs interrupt this run;
+  # that rerun's session_pipeline() then cancels this run's stages and fetch.
+  return lambda: status.caption("%s %.0fs" % (what, time.perf_counter() - started))
+
+try:
+  result = pipe.wait(data, tick("Fetching businesses..."))
+except (ValueError, OSError) as e:
+  # Unreadable files and missing Lat/Lon columns are the visitor's input, not a crash.
+  if source_kind != "Local file":
+    raise
+  status.empty()
+  st.error("Could not read %s: %s" % (name, e))
+  st.stop()
+
+if source_kind == "Local file":
+  st.write("%d businesses; showing a sample of %d" % (result.rows, len(result.sample)))
+  test, pyramid, source = result.sample, result.pyramid, inputs
+  # County counts come from every row of the file, not from the sample.
+  counties, bounds = result.counties, result.bounds
+else:
+  test = result
+  # Hex levels precomputed offline are read from the store; the rest are built here.
+  pyramid = yelpmap.store.StoredPyramid(aggregate_store(), Geog, Query, lambda: hex_pyramid(test))
+  source = inputs
+  counties = bounds = None
+table_slot.write(test)
+timer.rendered()
 
 # MapYelps(test)
-show_map(test, markers = False, HexHeat = 'Hex', fillGeom=True, res = 7, zoom = 9)
+# Render progressively: markers first, then the hex layer, then the filled coverage.
+stages = ['markers']
+pipe.submit('markers', map_html, test, markers = True, HexHeat = None, zoom = 9, source = source)
+if aggregate == 'Hex':
+  stages.append('hexes')
+  pipe.submit('hexes', map_html, test, markers = False, HexHeat = 'Hex', fillGeom=False, res = res, zoom = 9, pyramid = pyramid, source = source)
+stages.append('final')
+pipe.submit('final', map_html, test, markers = False, HexHeat = aggregate, fillGeom=fill, res = res, zoom = 9, pyramid = pyramid, source = source,
+            counties = counties, bounds = bounds)
+
+def stage_failed(stage, error):
+  st.error("Could not build the %s layer: %s" % (stage, error))
+
+for stage, html in pipe.progressive(stages, tick("Building the map..."), stage_failed):
+  with map_slot.container():
+    with metrics.span("render"):
+      components.html(html, width=700, height=450)
+status.empty()
 st.write('test complete')
 
+# Stages reused from an earlier rerun weren't recorded live; add their timings.
+metrics.add_stages(dict(pipe.timings))
+run = metrics.finish_run()
+if show_metrics:
+  metrics.sidebar_panel(run)
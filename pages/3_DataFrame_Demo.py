@@ -14,46 +14,65 @@
 
 from urllib.error import URLError
 
-import altair as alt
-import pandas as pd
-
 import streamlit as st
 from streamlit.hello.utils import show_code
 
+from lazy import lazy_import
+from startup import PageTimer
+from un_data import VALUE, UNData
+
+# Altair is only needed once there is a chart to draw.
+alt = lazy_import("altair")
+
+timer = PageTimer("DataFrame Demo")
+
+
+@st.cache_resource
+def un_data():
+    """The UN tables, from the local Parquet cache (downloaded on first use)."""
+    return UNData.open()
+
+
+@st.cache_data(max_entries=64)
+def area_chart_spec(countries):
+    """Vega-Lite spec of the area chart for a tuple of countries."""
+    data = un_data().chart_data(countries)
+    return area_chart(data).to_dict()
+
+
+def area_chart(data):
+    return (
+        alt.Chart(data)
+        .mark_area(opacity=0.3)
+        .encode(
+            x="year:T",
+            y=alt.Y("%s:Q" % VALUE, stack=None),
+            color="Region:N",
+        )
+    )
+
 
 def data_frame_demo():
-    @st.cache_data
-    def get_UN_data():
-        AWS_BUCKET_URL = "https://streamlit-demo-data.s3-us-west-2.amazonaws.com"
-        df = pd.read_csv(AWS_BUCKET_URL + "/agri.csv.gz")
-        return df.set_index("Region")
+    memoize = st.sidebar.checkbox("Memoize chart specs", True)
 
     try:
-        df = get_UN_data()
+        data = un_data()
         countries = st.multiselect(
-            "Choose countries", list(df.index), ["China", "United States of America"]
+            "Choose countries", data.regions, ["China", "United States of America"]
         )
         if not countries:
             st.error("Please select at least one country.")
         else:
-            data = df.loc[countries]
-            data /= 1000000.0
-            st.write("### Gross Agricultural Production ($B)", data.sort_index())
-
-            data = data.T.reset_index()
-            data = pd.melt(data, id_vars=["index"]).rename(
-                columns={"index": "year", "value": "Gross Agricultural Product ($B)"}
-            )
-            chart = (
-                alt.Chart(data)
-                .mark_area(opacity=0.3)
-                .encode(
-                    x="year:T",
-                    y=alt.Y("Gross Agricultural Product ($B):Q", stack=None),
-                    color="Region:N",
-                )
-            )
-            st.altair_chart(chart, use_container_width=True)
+            st.write("### Gross Agricultural Production ($B)", data.table(countries))
+            timer.rendered()
+
+            if memoize:
+                # The spec depends only on which countries are selected, not their order.
+                spec = area_chart_spec(tuple(sorted(countries)))
+                st.vega_lite_chart(spec, use_container_width=True)
+            else:
+                chart = area_chart(data.chart_data(countries))
+                st.altair_chart(chart, use_container_width=True)
     except URLError as e:
         st.error(
             """
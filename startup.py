@@ -0,0 +1,142 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cold-start profiling for the multipage app.
+
+    python -m startup [Hello.py pages/2_Mapping_Demo.py ...] [--top N] [--json]
+
+The command runs the import statements of each page in a fresh interpreter
+with `python -X importtime` and reports the total and the slowest top-level
+imports. Compare its output across commits to catch import regressions.
+
+Inside the app, a page creates a PageTimer right after its imports and
+calls rendered() once its first real content is on screen. The time in
+between (including lazy imports triggered on the way) is logged and kept
+in RECORDS, marked cold for the first run of that page in the process.
+"""
+
+import argparse
+import ast
+import collections
+import glob
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from Hello import LOGGER
+from lazy import load_times
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+RECORDS = collections.deque(maxlen=500)
+_seen = set()
+_lock = threading.Lock()
+
+
+class PageTimer:
+    def __init__(self, page):
+        self.page = page
+        self.start = time.perf_counter()
+        self.seconds = None
+        with _lock:
+            self.cold = page not in _seen
+            _seen.add(page)
+
+    def rendered(self):
+        """Record time-to-first-render for this run; later calls are ignored."""
+        if self.seconds is not None:
+            return self.seconds
+        self.seconds = time.perf_counter() - self.start
+        RECORDS.append({
+            "page": self.page,
+            "cold": self.cold,
+            "seconds": self.seconds,
+            "lazy_imports": load_times(),
+            "time": time.time(),
+        })
+        LOGGER.info("%s: first render after %.0f ms (%s)",
+                    self.page, 1000 * self.seconds, "cold" if self.cold else "warm")
+        return self.seconds
+
+
+def page_imports(path):
+    """Source of the top-level import statements of a script."""
+    with open(path) as f:
+        source = f.read()
+    tree = ast.parse(source, path)
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.get_source_segment(source, n) for n in nodes)
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative), depth))
+    return rows
+
+
+def import_profile(path, python=sys.executable):
+    """Import timings of a page in a fresh interpreter: {'total': s, 'modules': [(name, s)]}."""
+    code = page_imports(path)
+    started = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError("importing %s failed:\n%s" % (path, result.stderr.strip().splitlines()[-1]))
+    top = [(name, cumulative / 1e6) for name, _, cumulative, depth in parse_importtime(result.stderr) if depth == 0]
+    return {
+        "total": sum(seconds for _, seconds in top),
+        "wall": wall,
+        "modules": sorted(top, key=lambda row: -row[1]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("pages", nargs="*", help="scripts to profile (default: Hello.py and pages/*.py)")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per page")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per page instead")
+    args = parser.parse_args(argv)
+
+    pages = args.pages or [os.path.join(ROOT, "Hello.py")] + sorted(glob.glob(os.path.join(ROOT, "pages", "*.py")))
+    failed = 0
+    for page in pages:
+        name = os.path.relpath(page, ROOT)
+        try:
+            profile = import_profile(page)
+        except RuntimeError as e:
+            failed += 1
+            print("FAILED %s: %s" % (name, e), file=sys.stderr)
+            continue
+        if args.json:
+            print(json.dumps(dict(profile, page=name)))
+            continue
+        print("%s: imports %.0f ms (process %.0f ms)" % (name, 1000 * profile["total"], 1000 * profile["wall"]))
+        for module, seconds in profile["modules"][:args.top]:
+            print("  %8.1f ms  %s" % (1000 * seconds, module))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Constant-memory live line charts.
+
+Points go into a fixed-capacity ring buffer, so a stream can run for hours
+without the chart's data growing. Instead of one add_rows() message per
+tick, the chart is redrawn at most every flush_interval seconds with the
+buffered window, downsampled by LTTB (Largest-Triangle-Three-Buckets) to at
+most max_points points per series, so each flush costs the same however
+long the stream has been running.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class RingBuffer:
+    """The last `capacity` rows of a stream of `width`-column rows."""
+
+    def __init__(self, capacity, width=1, dtype=np.float64):
+        self.capacity = capacity
+        self.width = width
+        self.total = 0  # rows ever appended
+        self._data = np.empty((capacity, width), dtype=dtype)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=self._data.dtype).reshape(-1, self.width)
+        if len(rows) > self.capacity:
+            # Only the tail survives; skip the rest without copying it in.
+            self.total += len(rows) - self.capacity
+            rows = rows[-self.capacity:]
+        start = self.total % self.capacity
+        end = start + len(rows)
+        if end <= self.capacity:
+            self._data[start:end] = rows
+        else:
+            split = self.capacity - start
+            self._data[start:] = rows[:split]
+            self._data[:end - self.capacity] = rows[split:]
+        self.total += len(rows)
+
+    def last(self):
+        """The most recent row."""
+        return self._data[(self.total - 1) % self.capacity]
+
+    def window(self):
+        """(index, rows): stream positions and rows of the buffered window, oldest first."""
+        n = len(self)
+        index = np.arange(self.total - n, self.total)
+        if self.total <= self.capacity:
+            return index, self._data[:n]
+        start = self.total % self.capacity
+        return index, np.concatenate([self._data[start:], self._data[:start]])
+
+
+def lttb(y, threshold, x=None):
+    """
+    Indices of `threshold` points of the series y (at positions x) chosen by
+    Largest-Triangle-Three-Buckets, which keeps peaks and the overall shape.
+    Returns every index when the series is already short enough.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # The first and last points are kept; the rest is split into threshold - 2 buckets.
+    bounds = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    bounds[-1] = n - 1
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        nlo, nhi = hi, bounds[i + 2] if i + 2 < len(bounds) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        # Twice the area of the triangle (point a, candidate, next bucket's average).
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+class StreamingChart:
+    """
+    A line chart drawn into an st.empty() placeholder from a ring buffer.
+    push() rows as they arrive; the chart is redrawn at most every
+    flush_interval seconds (call flush(force=True) at the end of a stream).
+    """
+
+    def __init__(self, placeholder, columns=None, capacity=10_000, max_points=1_000,
+                 flush_interval=0.25, clock=time.monotonic):
+        self.placeholder = placeholder
+        self.columns = list(columns) if columns is not None else None
+        self.capacity = capacity
+        self.max_points = max_points
+        self.flush_interval = flush_interval
+        self.buffer = None
+        self._clock = clock
+        self._flushed = None
+
+    def push(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim == 1:
+            rows = rows.reshape(-1, 1)
+        if self.buffer is None:
+            self.buffer = RingBuffer(self.capacity, rows.shape[1])
+        self.buffer.append(rows)
+        self.flush()
+
+    def last(self):
+        return self.buffer.last()
+
+    def frame(self):
+        """The displayed window as a DataFrame indexed by stream position."""
+        index, rows = self.buffer.window()
+        if len(rows) > self.max_points:
+            # Union of each series' LTTB picks, so no column loses its peaks.
+            picks = [lttb(rows[:, j], self.max_points, index) for j in range(rows.shape[1])]
+            keep = picks[0] if len(picks) == 1 else np.unique(np.concatenate(picks))
+            index, rows = index[keep], rows[keep]
+        return pd.DataFrame(rows, index=index, columns=self.columns)
+
+    def flush(self, force=False):
+        """Redraw if the flush interval has passed (or force). Returns whether it did."""
+        if self.buffer is None:
+            return False
+        now = self._clock()
+        if not force and self._flushed is not None and now - self._flushed < self.flush_interval:
+            return False
+        self.placeholder.line_chart(self.frame())
+        self._flushed = now
+        return True
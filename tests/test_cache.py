@@ -0,0 +1,191 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the two-tier cache and the atomic writes behind it."""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from yelpmap.atomic import atomic_path
+from yelpmap.cache import TieredCache
+
+
+class _Unpicklable:
+    def memory_usage(self, deep=True):
+        return 10
+
+    def __reduce__(self):
+        raise TypeError("can't pickle this")
+
+
+class TieredCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_hit_and_miss(self):
+        cache = TieredCache()
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 1))
+
+    def test_ttl_expiry(self):
+        cache = TieredCache(ttl=10)
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            cache.put('a', 1)
+        with mock.patch('time.time', return_value=now + 5):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('time.time', return_value=now + 11):
+            self.assertIsNone(cache.get('a'))
+            self.assertIsNone(cache.lookup('a'))
+
+    def test_stale_value_is_served_while_it_refreshes(self):
+        cache = TieredCache(ttl=10, stale_ttl=60)
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            cache.put('a', 'old')
+        refreshed = threading.Event()
+
+        def compute():
+            refreshed.set()
+            return 'new'
+
+        with mock.patch('time.time', return_value=now + 20):
+            self.assertEqual(cache.get_or_compute('a', compute), 'old')
+        self.assertTrue(refreshed.wait(5))
+        deadline = time.monotonic() + 5
+        while cache.lookup('a')[0] != 'new' and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cache.get_or_compute('a', compute), 'new')
+        self.assertEqual(cache.stats.stale_hits, 1)
+
+    def test_concurrent_misses_compute_once(self):
+        cache = TieredCache()
+        calls = []
+        started = threading.Barrier(8)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+
+        def worker():
+            started.wait()
+            results.append(cache.get_or_compute('a', compute))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_reload_from_disk(self):
+        TieredCache(directory=self.directory).put(('search', 1), {'rows': [1, 2, 3]})
+        cache = TieredCache(directory=self.directory)
+        self.assertEqual(cache.get(('search', 1)), {'rows': [1, 2, 3]})
+        self.assertEqual(cache.stats.disk_hits, 1)
+        # Now in memory: no second disk read.
+        cache.get(('search', 1))
+        self.assertEqual(cache.stats.disk_hits, 1)
+
+    def test_expired_disk_entry_is_ignored(self):
+        now = time.time()
+        with mock.patch('time.time', return_value=now - 100):
+            TieredCache(directory=self.directory, ttl=10).put('a', 1)
+        self.assertIsNone(TieredCache(directory=self.directory, ttl=10).get('a'))
+
+    def test_eviction_by_entries(self):
+        cache = TieredCache(max_entries=2)
+        for key in 'abc':
+            cache.put(key, key)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'c')
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_eviction_keeps_recently_used(self):
+        cache = TieredCache(max_entries=2)
+        cache.put('a', 'a')
+        cache.put('b', 'b')
+        cache.get('a')
+        cache.put('c', 'c')
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertIsNone(cache.get('b'))
+
+    def test_eviction_by_bytes(self):
+        cache = TieredCache(max_bytes=250)
+        cache.put('a', b'x' * 100)
+        cache.put('b', b'x' * 100)
+        cache.put('c', b'x' * 100)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache.get('c')), 100)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_disk_is_trimmed(self):
+        cache = TieredCache(directory=self.directory, disk_max_bytes=2000)
+        for i in range(10):
+            cache.put(i, b'x' * 500)
+        size = sum(os.path.getsize(os.path.join(self.directory, f)) for f in self.files())
+        self.assertLessEqual(size, 2000)
+
+    def test_failed_disk_write_changes_nothing(self):
+        cache = TieredCache(directory=self.directory)
+        with self.assertRaises(TypeError):
+            cache.put('a', _Unpicklable())
+        self.assertIsNone(cache.lookup('a'))
+        self.assertEqual(self.files(), [])
+
+
+class AtomicPathTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'out.txt')
+
+    def test_replaces_the_target(self):
+        with open(self.path, 'w') as f:
+            f.write('old')
+        with atomic_path(self.path) as tmp_path, open(tmp_path, 'w') as f:
+            f.write('new')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'new')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['out.txt'])
+
+    def test_failure_removes_the_temp_file_and_keeps_the_target(self):
+        with open(self.path, 'w') as f:
+            f.write('old')
+        with self.assertRaises(RuntimeError):
+            with atomic_path(self.path) as tmp_path, open(tmp_path, 'w') as f:
+                f.write('partial')
+                raise RuntimeError()
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'old')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['out.txt'])
+
+
+if __name__ == "__main__":
+    unittest.main()
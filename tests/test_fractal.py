@@ -0,0 +1,62 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the Julia set engine behind the Animation demo."""
+
+import multiprocessing
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.suite import legacy_julia_frame
+from fractal import escape_counts, frame_constants, julia_frame, render_frames
+
+# A quarter-size grid with the page's aspect ratio and view.
+WIDTH, HEIGHT, SCALE = 240, 160, 100
+
+
+class EscapeCountsTest(unittest.TestCase):
+    def test_matches_the_legacy_masked_loop(self):
+        for c in frame_constants(0.7885, 7):
+            for iterations in (1, 5, 20):
+                counts = escape_counts(c, iterations, WIDTH, HEIGHT, SCALE)
+                expected = legacy_julia_frame(c, iterations, WIDTH, HEIGHT, SCALE)
+                top = counts.max()
+                if top:
+                    np.testing.assert_array_equal(1.0 - counts / top, expected)
+                else:
+                    self.assertTrue(np.isnan(expected).all())
+
+    def test_complex64_is_close(self):
+        c = frame_constants(0.7885)[33]
+        single = escape_counts(c, 20, WIDTH, HEIGHT, SCALE, dtype=np.complex64)
+        double = escape_counts(c, 20, WIDTH, HEIGHT, SCALE)
+        self.assertGreater((single == double).mean(), 0.99)
+
+
+class RenderFramesTest(unittest.TestCase):
+    def test_pool_renders_the_same_frames_in_order(self):
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            pooled = list(render_frames(3, 0.7885, frames=4, pool=pool))
+        serial = list(render_frames(3, 0.7885, frames=4))
+        self.assertEqual(len(pooled), 4)
+        for a, b in zip(pooled, serial):
+            np.testing.assert_array_equal(a, b)
+        np.testing.assert_array_equal(serial[0], julia_frame(frame_constants(0.7885, 4)[0], 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
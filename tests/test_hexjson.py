@@ -0,0 +1,69 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the H3 cell GeoJSON writer and its boundary cache."""
+
+import io
+import json
+import unittest
+
+import numpy as np
+
+import h3
+
+from yelpmap.hexjson import BoundaryCache, write_hex_geojson
+
+CELLS = sorted(h3.k_ring(h3.geo_to_h3(39.97, -83.0, 9), 10))
+
+
+class BoundaryCacheTest(unittest.TestCase):
+    def test_stays_within_max_bytes(self):
+        cache = BoundaryCache(max_bytes=50_000)
+        for hex_id in CELLS:
+            cache.get(hex_id)
+        self.assertLessEqual(cache.nbytes, 50_000)
+        self.assertLess(len(cache), len(CELLS))
+        self.assertEqual(cache.stats.evictions, len(CELLS) - len(cache))
+
+    def test_evicts_least_recently_used(self):
+        cache = BoundaryCache()
+        cache.get(CELLS[0])
+        per_entry = cache.nbytes
+        cache = BoundaryCache(max_bytes=2 * per_entry + per_entry // 2)
+        cache.get(CELLS[0])
+        cache.get(CELLS[1])
+        cache.get(CELLS[0])
+        cache.get(CELLS[2])
+        cache.get(CELLS[0])
+        self.assertEqual(cache.stats.misses, 3)
+
+    def test_ring_matches_h3(self):
+        ring = BoundaryCache().get(CELLS[0])
+        np.testing.assert_allclose(ring, h3.h3_to_geo_boundary(CELLS[0], geo_json=True))
+
+
+class WriteHexGeojsonTest(unittest.TestCase):
+    def test_features_and_errors(self):
+        out = io.StringIO()
+        report = write_hex_geojson(out, CELLS[:3] + ['not a cell'], {'counts': [1, 2, 3, 4]},
+                                   cache=BoundaryCache())
+        collection = json.loads(out.getvalue())
+        self.assertEqual(report.features, 3)
+        self.assertEqual([e[0] for e in report.errors], ['not a cell'])
+        self.assertEqual([f['id'] for f in collection['features']], CELLS[:3])
+        self.assertEqual([f['properties']['counts'] for f in collection['features']], [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
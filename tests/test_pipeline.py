@@ -0,0 +1,85 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the staged page pipeline."""
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from yelpmap.pipeline import Pipeline, session_pipeline
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_finished_stage_is_reused(self):
+        calls = []
+        pipe = Pipeline(self.executor, 'key')
+        first = pipe.submit('data', lambda: calls.append(1) or len(calls))
+        self.assertEqual(first.result(), 1)
+        self.assertIs(pipe.submit('data', lambda: calls.append(1) or len(calls)), first)
+        self.assertEqual(calls, [1])
+
+    def test_failed_stage_is_run_again(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("transient")
+            return "ok"
+
+        pipe = Pipeline(self.executor, 'key')
+        with self.assertRaises(OSError):
+            pipe.submit('data', flaky).result()
+        self.assertEqual(pipe.submit('data', flaky).result(), "ok")
+        self.assertEqual(len(attempts), 2)
+
+    def test_progressive_reports_failed_stages_and_keeps_going(self):
+        def fail():
+            raise ValueError("broken layer")
+
+        pipe = Pipeline(self.executor, 'key')
+        pipe.submit('markers', lambda: 'markers').result()
+        pipe.submit('hexes', fail).exception()
+        pipe.submit('final', lambda: 'final').result()
+        errors = []
+        shown = list(pipe.progressive(['markers', 'hexes', 'final'], lambda: None,
+                                      lambda name, e: errors.append((name, str(e)))))
+        self.assertEqual(shown[-1], ('final', 'final'))
+        self.assertNotIn('hexes', [name for name, _ in shown])
+        self.assertIn(('hexes', 'broken layer'), errors)
+
+    def test_progressive_raises_without_on_error(self):
+        def fail():
+            raise ValueError("broken layer")
+
+        pipe = Pipeline(self.executor, 'key')
+        pipe.submit('final', fail)
+        with self.assertRaises(ValueError):
+            list(pipe.progressive(['final'], lambda: None))
+
+    def test_new_key_cancels_the_old_pipeline(self):
+        state = {}
+        old = session_pipeline(state, self.executor, 'a')
+        self.assertIs(session_pipeline(state, self.executor, 'a'), old)
+        new = session_pipeline(state, self.executor, 'b')
+        self.assertIsNot(new, old)
+        self.assertTrue(old.cancelled.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the offline precompute jobs and the store the page reads them from."""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_businesses
+from yelpmap import precompute
+from yelpmap.pyramid import HexPyramid
+from yelpmap.store import STORED_AGGS, AggregateStore, StoredPyramid, slug
+
+
+class PrecomputeTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store_root = os.path.join(tmp.name, 'store')
+        self.fixtures = os.path.join(tmp.name, 'fixtures')
+        os.makedirs(self.fixtures)
+        with open(os.path.join(self.fixtures, '%s__%s.json' % (slug('Columbus, Ohio'), slug('barbecue'))), 'w') as f:
+            json.dump(synthetic_businesses(800), f)
+        self.jobs = [{'location': 'Columbus, Ohio', 'term': 'barbecue', 'resolution': res, 'fill': None}
+                     for res in (6, 8)]
+
+    def test_jobs_are_grouped_by_search(self):
+        jobs = self.jobs + [{'location': 'columbus ohio', 'term': 'Barbecue', 'resolution': 7, 'fill': None},
+                            {'location': 'Dayton, Ohio', 'term': 'barbecue', 'resolution': 7, 'fill': None}]
+        self.assertEqual([len(group) for group in precompute.group_jobs(jobs)], [3, 1])
+
+    def test_search_is_fetched_once(self):
+        with mock.patch.object(precompute, 'fixture_businesses', wraps=precompute.fixture_businesses) as fetch:
+            manifests = precompute.run_search(self.jobs, self.store_root, self.fixtures)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual([m['resolution'] for m in manifests], [6, 8])
+        store = AggregateStore(self.store_root)
+        self.assertTrue(store.done('Columbus, Ohio', 'barbecue', 6))
+        self.assertTrue(store.done('Columbus, Ohio', 'barbecue', 8))
+
+    def test_stored_levels_match_the_page_pyramid(self):
+        precompute.run_search(self.jobs, self.store_root, self.fixtures)
+        store = AggregateStore(self.store_root)
+        df = store.businesses('Columbus, Ohio', 'barbecue')
+        page = HexPyramid.from_frame(df)
+        fallbacks = []
+        stored = StoredPyramid(store, 'Columbus, Ohio', 'barbecue', lambda: fallbacks.append(1) or page)
+        for res in (6, 8):
+            pd.testing.assert_frame_equal(stored.level(res), page.level(res))
+            pd.testing.assert_frame_equal(stored.level(res, STORED_AGGS), page.level(res, STORED_AGGS))
+        self.assertEqual(fallbacks, [])
+        # Levels no job wrote come from the fallback.
+        pd.testing.assert_frame_equal(stored.level(7), page.level(7))
+        self.assertEqual(fallbacks, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
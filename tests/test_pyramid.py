@@ -0,0 +1,97 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the H3 aggregation pyramid against a plain geo_to_h3 + groupby."""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import h3
+
+from yelpmap import hexes
+from yelpmap.pyramid import HexPyramid
+
+# Roughly Franklin County, Ohio, the page's default geography.
+CENTER = (39.9698749, -83.0090858)
+
+
+def points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Lat': rng.normal(CENTER[0], 0.25, n),
+        'Lon': rng.normal(CENTER[1], 0.25, n),
+        'Rating': rng.integers(2, 11, n) / 2,
+    })
+
+
+def baseline(df, res):
+    hex_id = [h3.geo_to_h3(lat, lon, res) for lat, lon in zip(df.Lat, df.Lon)]
+    return df.assign(hex_id=hex_id).groupby('hex_id')
+
+
+class HexPyramidTest(unittest.TestCase):
+    def test_every_level_matches_geo_to_h3(self):
+        df = points(5000)
+        pyramid = HexPyramid.from_frame(df)
+        for res in pyramid.resolutions:
+            expected = baseline(df, res).size()
+            level = pyramid.level(res).set_index('hex_id').counts
+            pd.testing.assert_series_equal(level.sort_index(), expected.sort_index(),
+                                           check_names=False, check_dtype=False)
+
+    def test_chunks_add_up_to_the_whole(self):
+        df = points(3000, seed=1)
+        whole = HexPyramid.from_frame(df, columns=['Rating'])
+        chunked = HexPyramid(columns=['Rating'])
+        for start in range(0, len(df), 700):
+            part = df.iloc[start:start + 700]
+            chunked.add(part.Lat.values, part.Lon.values, {'Rating': part.Rating.values})
+        aggs = {'counts': (None, 'count'), 'mean_rating': ('Rating', 'mean')}
+        for res in whole.resolutions:
+            pd.testing.assert_frame_equal(chunked.level(res, aggs), whole.level(res, aggs))
+
+    def test_mean_matches_groupby(self):
+        df = points(2000, seed=2)
+        level = HexPyramid.from_frame(df).level(7, {'mean_rating': ('Rating', 'mean')})
+        expected = baseline(df, 7).Rating.mean()
+        np.testing.assert_allclose(level.set_index('hex_id').mean_rating.sort_index(), expected.sort_index())
+
+    def test_rollup_keeps_totals(self):
+        df = points(2000, seed=3)
+        pyramid = HexPyramid.from_frame(df, rollup=True)
+        self.assertEqual(pyramid.level(9).counts.sum(), len(df))
+        self.assertEqual(pyramid.level(5).counts.sum(), len(df))
+
+    def test_resolution_outside_the_pyramid(self):
+        with self.assertRaises(ValueError):
+            HexPyramid(finest=8, coarsest=6).level(9)
+
+
+class HexIdsTest(unittest.TestCase):
+    def test_process_pool_matches_one_pass(self):
+        df = points(3000, seed=4)
+        serial = hexes.hex_ids(df.Lat.values, df.Lon.values, [6, 8])
+        with mock.patch.object(hexes, 'PARALLEL_MIN_POINTS', 1000):
+            pooled = hexes.hex_ids(df.Lat.values, df.Lon.values, [6, 8], workers=2, chunk_size=1000)
+        for res in (6, 8):
+            np.testing.assert_array_equal(pooled[res], serial[res])
+            self.assertEqual(list(serial[res][:5]), [int(h3.geo_to_h3(a, b, res), 16)
+                                                     for a, b in zip(df.Lat[:5], df.Lon[:5])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the local data sources behind the Mapping page."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import shapely
+
+from yelpmap.sources import CSVSource, local_path, stream_summary
+from yelpmap.spatial_join import county_aggregates
+
+
+class LocalPathTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.realpath(tmp.name)
+        self.directory = os.path.join(self.root, 'local')
+        os.makedirs(os.path.join(self.directory, 'sub'))
+        self.inside = os.path.join(self.directory, 'sub', 'points.csv')
+        self.outside = os.path.join(self.root, 'secret.csv')
+        for path in (self.inside, self.outside):
+            with open(path, 'w') as f:
+                f.write('Lat,Lon\n')
+
+    def test_file_inside(self):
+        self.assertEqual(local_path(os.path.join('sub', 'points.csv'), self.directory), self.inside)
+
+    def test_parent_directory(self):
+        with self.assertRaises(ValueError):
+            local_path(os.path.join('..', 'secret.csv'), self.directory)
+        with self.assertRaises(ValueError):
+            local_path(os.path.join('sub', '..', '..', 'secret.csv'), self.directory)
+
+    def test_absolute_path(self):
+        with self.assertRaises(ValueError):
+            local_path(self.outside, self.directory)
+        with self.assertRaises(ValueError):
+            local_path('/etc/passwd', self.directory)
+
+    def test_symlink_out_of_the_directory(self):
+        link = os.path.join(self.directory, 'link.csv')
+        os.symlink(self.outside, link)
+        with self.assertRaises(ValueError):
+            local_path('link.csv', self.directory)
+
+    def test_sibling_with_a_common_prefix(self):
+        os.makedirs(self.directory + '2')
+        sibling = os.path.join(self.directory + '2', 'points.csv')
+        with open(sibling, 'w') as f:
+            f.write('Lat,Lon\n')
+        with self.assertRaises(ValueError):
+            local_path(os.path.join('..', 'local2', 'points.csv'), self.directory)
+
+    def test_missing_file(self):
+        with self.assertRaises(ValueError):
+            local_path('nothing.csv', self.directory)
+
+
+class _Counties:
+    """Two side-by-side square 'counties', standing in for a GeometryLOD."""
+
+    def __init__(self):
+        self.frame = pd.DataFrame({
+            'GEOID': ['00001', '00002'],
+            'geometry': [shapely.box(-84, 39, -83, 40), shapely.box(-83, 39, -82, 40)],
+        })
+
+    def bbox(self, minx, miny, maxx, maxy, level=0):
+        return self.frame
+
+
+class StreamSummaryTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 2000
+        rating = rng.integers(2, 11, n) / 2
+        rating[::7] = np.nan
+        self.df = pd.DataFrame({
+            'Name': ['Business %d' % i for i in range(n)],
+            'Lat': rng.uniform(39.1, 39.9, n),
+            'Lon': rng.uniform(-84.5, -82.5, n),
+            'Rating': rating,
+        })
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'points.csv')
+        self.df.to_csv(self.path, index=False)
+
+    def test_county_aggregates_cover_every_row(self):
+        counties = _Counties()
+        summary = stream_summary(CSVSource(self.path, chunk_rows=300), columns=('Rating',),
+                                 sample_rows=100, geometries=counties)
+        self.assertEqual(summary.rows, len(self.df))
+        self.assertEqual(len(summary.sample), 100)
+        expected = county_aggregates(self.df, counties)
+        pd.testing.assert_frame_equal(summary.counties, expected, check_dtype=False)
+
+    def test_missing_lat_lon(self):
+        self.df.drop(columns='Lat').to_csv(self.path, index=False)
+        with self.assertRaises(ValueError):
+            stream_summary(CSVSource(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Tests for the Yelp fetch engine against the local stub server.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import email.utils
+import threading
+import time
+import unittest
+from concurrent.futures import CancelledError
+
+import requests
+
+from benchmarks.stub_server import StubYelpServer
+from yelpmap.yelp import PAGE_SIZE, YelpClient, retry_after
+
+
+def businesses(n):
+    return [{"name": "Business %d" % i} for i in range(n)]
+
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(retry_after(_Response({"Retry-After": "3"})), 3.0)
+
+    def test_http_date(self):
+        value = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(retry_after(_Response({"Retry-After": value})), 30, delta=1.5)
+
+    def test_past_date_is_no_wait(self):
+        value = email.utils.formatdate(time.time() - 30, usegmt=True)
+        self.assertEqual(retry_after(_Response({"Retry-After": value})), 0.0)
+
+    def test_missing_or_garbage(self):
+        self.assertIsNone(retry_after(_Response({})))
+        self.assertIsNone(retry_after(_Response({"Retry-After": "soon"})))
+
+
+class YelpClientTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubYelpServer(businesses(3 * PAGE_SIZE + 10)).__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+
+    def client(self, **kwargs):
+        kwargs = {"base_url": self.stub.url, "rate": 1000, "backoff": 0.01, **kwargs}
+        client = YelpClient("key", **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def statuses(self, offset=0):
+        return [status for _, o, status in self.stub.hits if o == offset]
+
+    def gaps(self, offset=0):
+        times = [t for t, o, _ in self.stub.hits if o == offset]
+        return [b - a for a, b in zip(times, times[1:])]
+
+    def test_first_page_comes_first_and_every_page_once(self):
+        pages = list(self.client().iter_pages("Columbus", "barbecue"))
+        self.assertEqual(pages[0], self.stub.businesses[:PAGE_SIZE])
+        names = [b["name"] for page in pages for b in page]
+        self.assertEqual(sorted(names), sorted(b["name"] for b in self.stub.businesses))
+
+    def test_one_worker_yields_pages_in_offset_order(self):
+        pages = list(self.client(max_workers=1).iter_pages("Columbus", "barbecue"))
+        self.assertEqual([b for page in pages for b in page], self.stub.businesses)
+
+    def test_retries_429_and_5xx(self):
+        self.stub.fail(429, times=2, retry_after="0")
+        self.stub.fail(500)
+        page = self.client(retries=4).get_page({"offset": 0, "limit": PAGE_SIZE})
+        self.assertEqual(page["businesses"], self.stub.businesses[:PAGE_SIZE])
+        self.assertEqual(self.statuses(), [429, 429, 500, 200])
+
+    def test_gives_up_after_retries(self):
+        self.stub.fail(503, times=10)
+        with self.assertRaises(requests.HTTPError):
+            self.client(retries=2).get_page({"offset": 0, "limit": PAGE_SIZE})
+        self.assertEqual(self.statuses(), [503, 503, 503])
+
+    def test_retry_after_seconds_is_honored(self):
+        # A backoff far longer than Retry-After shows which one was used.
+        self.stub.fail(429, retry_after="1")
+        self.client(backoff=30).get_page({"offset": 0, "limit": PAGE_SIZE})
+        self.assertEqual(self.statuses(), [429, 200])
+        gap, = self.gaps()
+        self.assertGreaterEqual(gap, 0.9)
+        self.assertLess(gap, 5)
+
+    def test_retry_after_http_date_is_honored(self):
+        # HTTP-dates have whole seconds, so the wait is between 1 and 2 seconds.
+        self.stub.fail(503, retry_after=email.utils.formatdate(time.time() + 2, usegmt=True))
+        self.client(backoff=30).get_page({"offset": 0, "limit": PAGE_SIZE})
+        self.assertEqual(self.statuses(), [503, 200])
+        gap, = self.gaps()
+        self.assertGreaterEqual(gap, 0.9)
+        self.assertLess(gap, 5)
+
+    def test_400_is_not_retried(self):
+        self.stub.fail(400)
+        client = self.client()
+        self.assertIsNone(client.get_page({"offset": 0, "limit": PAGE_SIZE}))
+        self.assertEqual(self.statuses(), [400])
+
+    def test_400_on_first_page_ends_the_search(self):
+        self.stub.fail(400, offset=0)
+        self.assertEqual(list(self.client().iter_pages("Nowhere", "barbecue")), [])
+        self.assertEqual(len(self.stub.hits), 1)
+
+    def test_400_on_a_later_page_skips_it(self):
+        self.stub.fail(400, offset=PAGE_SIZE)
+        pages = list(self.client().iter_pages("Columbus", "barbecue"))
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn(self.stub.businesses[PAGE_SIZE], [b for page in pages for b in page])
+
+    def test_timeout_is_retried(self):
+        self.stub.stall(1.0)
+        page = self.client(timeout=0.2).get_page({"offset": 0, "limit": PAGE_SIZE})
+        self.assertEqual(page["businesses"], self.stub.businesses[:PAGE_SIZE])
+        self.assertEqual(len(self.stub.hits), 2)
+
+    def test_timeouts_give_up_after_retries(self):
+        self.stub.stall(1.0, times=10)
+        with self.assertRaises(requests.Timeout):
+            self.client(timeout=0.2, retries=1).get_page({"offset": 0, "limit": PAGE_SIZE})
+        self.assertEqual(len(self.stub.hits), 2)
+
+    def test_cancel_stops_the_search(self):
+        cancelled = threading.Event()
+        pages = self.client().iter_pages("Columbus", "barbecue", cancelled=cancelled)
+        next(pages)
+        cancelled.set()
+        with self.assertRaises(CancelledError):
+            list(pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
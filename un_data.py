@@ -0,0 +1,84 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local columnar cache of the UN agricultural production dataset.
+
+agri.csv.gz is downloaded and parsed once, then kept as two Parquet files:
+the wide table (one row per Region, one column per year) and a long
+Region/year/value table, both already scaled to billions of dollars and
+sorted by Region. Any later process just reads them back, and a selection
+is an indexed slice of each instead of a copy, rescale and melt.
+"""
+
+import os
+
+import pandas as pd
+
+from yelpmap.atomic import atomic_path
+
+AWS_BUCKET_URL = "https://streamlit-demo-data.s3-us-west-2.amazonaws.com"
+DATA_URL = AWS_BUCKET_URL + "/agri.csv.gz"
+DATA_DIR = os.environ.get("UN_DATA_DIR", "files")
+VALUE = "Gross Agricultural Product ($B)"
+SCALE = 1000000.0
+
+
+def _write(frame, path):
+    with atomic_path(path) as tmp_path:
+        frame.to_parquet(tmp_path)
+
+
+def build(directory=DATA_DIR, url=DATA_URL):
+    """Download and parse the CSV and write both Parquet tables into directory."""
+    os.makedirs(directory, exist_ok=True)
+    wide = pd.read_csv(url).set_index("Region").sort_index() / SCALE
+    long = (
+        wide.rename_axis(columns="year")
+        .stack()
+        .rename(VALUE)
+        .reset_index()
+        .set_index("Region")
+    )
+    _write(wide, os.path.join(directory, "agri_wide.parquet"))
+    _write(long, os.path.join(directory, "agri_long.parquet"))
+
+
+class UNData:
+    """The cached tables, opened with UNData.open(). Treat the frames as read-only."""
+
+    def __init__(self, wide, long):
+        self.wide = wide
+        self.long = long
+
+    @classmethod
+    def open(cls, directory=DATA_DIR, url=DATA_URL):
+        """Read the Parquet tables, building them first if they are missing."""
+        wide_path = os.path.join(directory, "agri_wide.parquet")
+        long_path = os.path.join(directory, "agri_long.parquet")
+        if not (os.path.exists(wide_path) and os.path.exists(long_path)):
+            build(directory, url)
+        return cls(pd.read_parquet(wide_path), pd.read_parquet(long_path))
+
+    @property
+    def regions(self):
+        return list(self.wide.index)
+
+    def table(self, countries):
+        """Wide rows of countries, in $B, sorted by Region."""
+        return self.wide.loc[sorted(countries)]
+
+    def chart_data(self, countries):
+        """Long-format year/Region/value rows of countries, for charting."""
+        return self.long.loc[list(countries)].reset_index()
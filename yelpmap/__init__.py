@@ -0,0 +1,42 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers behind the Mapping demo page.
+
+Submodules are imported on first attribute access (yelpmap.hexes, ...), so
+`import yelpmap` doesn't pull in geopandas, shapely, h3 or folium until a
+code path actually needs them.
+"""
+
+import importlib
+import os
+
+DATA_DIR = os.environ.get("YELPMAP_DATA_DIR", "files")
+
+_SUBMODULES = {
+    "atomic", "businesses", "cache", "colors", "counties", "coverage", "density", "hexes",
+    "hexjson", "mapcache", "markers", "pipeline", "precompute", "pyramid",
+    "simplify", "sources", "spatial_join", "store", "yelp",
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -0,0 +1,96 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Turn raw Yelp search pages into a typed business DataFrame.
+
+Each page is split into per-column NumPy arrays as it arrives; the frame is
+assembled with a single concatenation per column instead of growing it row
+by row.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Name', 'Lat', 'Lon', 'Rating', 'RatingCount', 'Distance']
+DTYPES = {
+    'Name': 'category',
+    'Lat': np.float64,
+    'Lon': np.float64,
+    'Rating': np.float64,
+    'RatingCount': np.int32,
+    'Distance': np.float64,
+}
+
+
+def page_columns(businesses):
+    """Split one page of business dicts into a dict of typed column arrays."""
+    names = []
+    lats = []
+    lons = []
+    ratings = []
+    counts = []
+    distances = []
+    for b in businesses:
+        coords = b.get('coordinates') or {}
+        names.append(b.get('name'))
+        lats.append(coords.get('latitude'))
+        lons.append(coords.get('longitude'))
+        ratings.append(b.get('rating'))
+        counts.append(b.get('review_count') or 0)
+        distances.append(b.get('distance'))
+
+    # float64 arrays turn missing values (None) into NaN.
+    return {
+        'Name': np.array(names, dtype=object),
+        'Lat': np.array(lats, dtype=np.float64),
+        'Lon': np.array(lons, dtype=np.float64),
+        'Rating': np.array(ratings, dtype=np.float64),
+        'RatingCount': np.array(counts, dtype=np.int32),
+        'Distance': np.array(distances, dtype=np.float64),
+    }
+
+
+class BusinessFrameBuilder:
+    """
+    Accumulates pages incrementally; frame() can be called at any point to get
+    the businesses seen so far.
+    """
+
+    def __init__(self):
+        self._chunks = {c: [] for c in COLUMNS}
+        self.rows = 0
+
+    def add_page(self, businesses):
+        columns = page_columns(businesses)
+        for c in COLUMNS:
+            self._chunks[c].append(columns[c])
+        self.rows += len(columns['Name'])
+        return self
+
+    def frame(self):
+        data = {}
+        for c in COLUMNS:
+            chunks = self._chunks[c]
+            values = np.concatenate(chunks) if chunks else np.array([], dtype=object if c == 'Name' else DTYPES[c])
+            data[c] = pd.Categorical(values) if c == 'Name' else values
+        return pd.DataFrame(data, columns=COLUMNS)
+
+
+def businesses_to_frame(pages):
+    """Build the business frame from an iterable of pages (lists of business dicts)."""
+    builder = BusinessFrameBuilder()
+    for page in pages:
+        builder.add_page(page)
+    return builder.frame()
@@ -0,0 +1,249 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Two-tier (memory + disk) cache with TTL expiry and stale-while-revalidate.
+
+Values are kept as Python objects in an in-process LRU and pickled to disk,
+so a DataFrame comes back with its dtypes intact and nothing is re-parsed.
+Entries older than `ttl` are still served for another `stale_ttl` seconds
+while a background thread recomputes them.
+
+Only the memory tier is touched under the cache lock; pickling, unpickling
+and disk trimming happen outside it, so one session's disk I/O doesn't
+stall lookups from the others.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from yelpmap.atomic import atomic_path
+
+
+def sizeof(value):
+    """Approximate in-memory size of a cached value, in bytes."""
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class TieredCache:
+    """
+    In-process LRU bounded by max_entries/max_bytes, backed by an optional
+    directory of pickles bounded by disk_max_bytes. Thread-safe; concurrent
+    misses on the same key are computed once.
+    """
+
+    def __init__(self, directory=None, ttl=3600.0, stale_ttl=0.0, max_entries=128,
+                 max_bytes=256 << 20, disk_max_bytes=1 << 30):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.stats = CacheStats()
+        self._memory = OrderedDict()  # key -> (created, size, value)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._refreshing = set()
+        self._building = {}  # key -> lock held while one caller computes it
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".pkl")
+
+    def _remember(self, key, created, value, size):
+        if key in self._memory:
+            self._bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (created, size, value)
+        self._bytes += size
+        while self._memory and (len(self._memory) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted, _) = self._memory.popitem(last=False)
+            self._bytes -= evicted
+            self.stats.evictions += 1
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                stored_key, created, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return (created, value) if stored_key == key else None
+
+    def _store(self, key, created, value):
+        if not self.directory:
+            return
+        with atomic_path(self._path(key)) as tmp_path, open(tmp_path, "wb") as f:
+            pickle.dump((key, created, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._trim_disk()
+
+    def _trim_disk(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except OSError:  # trimmed by a concurrent put
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+    def lookup(self, key):
+        """
+        Return (value, age_in_seconds) from memory or disk without counting
+        a hit or miss, or None if the key is absent or past ttl + stale_ttl.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, _, value = entry
+                if now - created > self.ttl + self.stale_ttl:
+                    self._bytes -= self._memory.pop(key)[1]
+                    return None
+                self._memory.move_to_end(key)
+                return value, now - created
+
+        loaded = self._load(key)
+        if loaded is None or now - loaded[0] > self.ttl + self.stale_ttl:
+            return None
+        created, value = loaded
+        size = sizeof(value)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] >= created:
+                # A put() landed while we were reading; keep the newer value.
+                created, _, value = entry
+            else:
+                self._remember(key, created, value, size)
+            self.stats.disk_hits += 1
+        return value, now - created
+
+    def get(self, key, default=None):
+        found = self.lookup(key)
+        with self._lock:
+            if found is None or found[1] > self.ttl:
+                self.stats.misses += 1
+                return default
+            self.stats.hits += 1
+        return found[0]
+
+    def put(self, key, value):
+        created = time.time()
+        size = sizeof(value)
+        # Disk first: if writing fails, put() raises with neither tier changed.
+        self._store(key, created, value)
+        with self._lock:
+            self._remember(key, created, value, size)
+        return value
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, calling compute() on a miss. A stale
+        entry is returned immediately and refreshed on a background thread.
+        """
+        found = self.lookup(key)
+        if found is not None:
+            value, age = found
+            with self._lock:
+                self.stats.hits += 1
+                if age <= self.ttl:
+                    return value
+                self.stats.stale_hits += 1
+                if key in self._refreshing:
+                    return value
+                self._refreshing.add(key)
+            threading.Thread(target=self._refresh, args=(key, compute), daemon=True).start()
+            return value
+
+        # Single flight: concurrent misses on one key wait for the first
+        # caller's result instead of computing it again.
+        with self._lock:
+            self.stats.misses += 1
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            found = self.lookup(key)
+            if found is not None and found[1] <= self.ttl:
+                return found[0]
+            try:
+                return self.put(key, compute())
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+    def _refresh(self, key, compute):
+        try:
+            self.put(key, compute())
+        except Exception:
+            # Keep serving the stale value; the next lookup will try again.
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+        if self.directory:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pkl"):
+                    try:
+                        os.unlink(entry.path)
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,114 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Vectorized value -> color mapping for choropleths.
+
+A colormap is sampled once into a lookup table of hex strings; values are
+binned with NumPy and the colors picked by indexing the table. 'linear'
+with the full table reproduces matplotlib.colors.to_hex(cmap(norm(v)))
+exactly. 'quantile' and 'log' binning suit skewed count distributions.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+import matplotlib
+
+SCHEMES = ('linear', 'quantile', 'log')
+
+
+def get_cmap(name):
+    try:
+        return matplotlib.colormaps[name]
+    except AttributeError:  # matplotlib < 3.5
+        return matplotlib.cm.get_cmap(name)
+
+
+@lru_cache(maxsize=32)
+def color_lut(cmap_name):
+    """
+    (lut, under, over, bad): the colormap's N entries as hex strings plus its
+    under/over/bad colors.
+    """
+    cmap = get_cmap(cmap_name)
+    to_hex = matplotlib.colors.to_hex
+    lut = np.array([to_hex(cmap(i)) for i in range(cmap.N)], dtype=object)
+    return lut, to_hex(cmap.get_under()), to_hex(cmap.get_over()), to_hex(cmap.get_bad())
+
+
+def _lut_index(x, n):
+    """Table index for normalized values x, with Colormap.__call__'s float semantics."""
+    with np.errstate(invalid='ignore'):
+        xa = x * n
+        xa[xa == n] = n - 1
+        under = xa < 0
+        over = xa >= n
+    bad = np.isnan(xa)
+    idx = np.clip(np.nan_to_num(xa), 0, n - 1).astype(np.intp)
+    return idx, under, over, bad
+
+
+def assign_colors(values, cmap_name="Blues", scheme="linear", n_bins=None, vmin=None, vmax=None):
+    """
+    Hex color of every value, as an object array aligned with values.
+
+    scheme 'linear' normalizes between vmin and vmax (default: data min/max);
+    'log' does the same on log10 of the positive values; 'quantile' puts an
+    equal share of the values into each of n_bins bins (default 7). For
+    linear/log, n_bins quantizes the ramp into that many steps. When vmin
+    equals vmax every value in range gets the top color of the ramp.
+    """
+    if scheme not in SCHEMES:
+        raise ValueError("Unknown color scheme %r; use one of %s" % (scheme, ", ".join(SCHEMES)))
+    values = np.asarray(values, dtype=np.float64)
+    lut, under, over, bad = color_lut(cmap_name)
+    n = len(lut)
+    if len(values) == 0:
+        return np.array([], dtype=object)
+
+    if scheme == 'quantile':
+        n_bins = n_bins or 7
+        edges = np.nanquantile(values, np.linspace(0, 1, n_bins + 1))
+        bins = np.searchsorted(edges[1:-1], values, side='right')
+        x = (bins + 0.5) / n_bins
+        x[np.isnan(values)] = np.nan
+    else:
+        if scheme == 'log':
+            positive = values[values > 0]
+            floor = positive.min() if len(positive) else 1.0
+            values = np.log10(np.where(values > 0, values, floor))
+            vmin = None if vmin is None else np.log10(vmin)
+            vmax = None if vmax is None else np.log10(vmax)
+        vmin = np.nanmin(values) if vmin is None else vmin
+        vmax = np.nanmax(values) if vmax is None else vmax
+        if vmax == vmin:
+            # A single value (or a zero range) has nothing to spread over the
+            # ramp; draw it with the top color instead of dividing by zero.
+            x = np.where(values > vmax, 2.0, 1.0)
+            x[values < vmin] = -1.0
+            x[np.isnan(values)] = np.nan
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                x = (values - vmin) / (vmax - vmin)
+        if n_bins:
+            x = (np.minimum(np.floor(x * n_bins), n_bins - 1) + 0.5) / n_bins
+
+    idx, is_under, is_over, is_bad = _lut_index(x, n)
+    colors = lut[idx]
+    colors[is_under] = under
+    colors[is_over] = over
+    colors[is_bad] = bad
+    return colors
@@ -0,0 +1,183 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local store for the TIGER county boundaries.
+
+The shapefile is downloaded (or imported from a local zip) once and rewritten
+as a Parquet file with one row group per state, WKB geometry and bounding box
+columns. Opening the store only reads the small GEOID/STATEFP/bbox columns
+(memory-mapped); geometry is read for the row groups a query actually needs.
+"""
+
+import os
+import shutil
+from urllib.request import urlopen
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import geopandas as gpd
+
+from yelpmap import DATA_DIR
+from yelpmap.atomic import atomic_path
+
+TIGER_URL = "https://www2.census.gov/geo/tiger/TIGER2022/COUNTY/tl_2022_us_county.zip"
+COUNTIES = "tl_2022_us_county"
+
+_INDEX_COLUMNS = ["GEOID", "STATEFP", "minx", "miny", "maxx", "maxy"]
+
+
+def download_tiger(directory=DATA_DIR, url=TIGER_URL):
+    """
+    Download the TIGER county zip into directory, unless it is already there.
+    Returns the path of the zip.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, os.path.basename(url))
+    if os.path.exists(path):
+        return path
+
+    with atomic_path(path) as tmp_path, open(tmp_path, "wb") as out, urlopen(url) as response:
+        shutil.copyfileobj(response, out, 1 << 20)
+    return path
+
+
+def build_store(zip_path, parquet_path):
+    """
+    Convert the county shapefile inside zip_path into the columnar store at
+    parquet_path.
+    """
+    return write_store(gpd.read_file("zip://" + os.path.abspath(zip_path)), parquet_path)
+
+
+def write_store(usa, parquet_path):
+    """
+    Write a GeoDataFrame with GEOID and STATEFP columns in the store layout:
+    sorted by STATEFP/GEOID, bbox columns, WKB geometry, one row group per state.
+    """
+    usa = usa.sort_values(["STATEFP", "GEOID"]).reset_index(drop=True)
+
+    bounds = usa.geometry.bounds
+    attrs = usa.drop(columns="geometry")
+    attrs = attrs.assign(
+        minx=bounds.minx.values,
+        miny=bounds.miny.values,
+        maxx=bounds.maxx.values,
+        maxy=bounds.maxy.values,
+    )
+    table = pa.Table.from_pandas(attrs, preserve_index=False)
+    table = table.append_column("geometry", pa.array(usa.geometry.to_wkb(), pa.binary()))
+    table = table.replace_schema_metadata({b"crs": usa.crs.to_wkt().encode()})
+
+    statefp = attrs.STATEFP.values
+    starts = np.flatnonzero(np.r_[True, statefp[1:] != statefp[:-1]])
+    stops = np.r_[starts[1:], len(statefp)]
+    # Separate processes may build the same store at once.
+    with atomic_path(parquet_path) as tmp_path, pq.ParquetWriter(tmp_path, table.schema) as writer:
+        for start, stop in zip(starts, stops):
+            writer.write_table(table.slice(start, stop - start))
+    return parquet_path
+
+
+class CountyStore:
+    """
+    Indexed, memory-mapped access to the county boundaries.
+
+    Use open() to build the store on first use; after that it only reads the
+    local Parquet file.
+    """
+
+    def __init__(self, directory=DATA_DIR, name=COUNTIES):
+        self.directory = directory
+        self.name = name
+        self.path = os.path.join(directory, name + ".parquet")
+        self._file = None
+        self._crs = None
+        self._row_by_geoid = {}
+        self._group_by_state = {}
+        self._offsets = None
+        self._bbox = None
+        self._index = None
+
+    def open(self, zip_path=None):
+        """
+        Open the store, building it first from zip_path (or a one-off download)
+        when the Parquet file does not exist yet. Stores other than the TIGER
+        counties (see write_store) must have been written beforehand.
+        """
+        if not os.path.exists(self.path):
+            if self.name != COUNTIES:
+                raise FileNotFoundError(self.path)
+            if zip_path is None:
+                zip_path = download_tiger(self.directory)
+            build_store(zip_path, self.path)
+
+        self._file = pq.ParquetFile(self.path, memory_map=True)
+        self._crs = self._file.schema_arrow.metadata[b"crs"].decode()
+        self._index = self._file.read(columns=_INDEX_COLUMNS).to_pandas()
+
+        sizes = [self._file.metadata.row_group(i).num_rows for i in range(self._file.num_row_groups)]
+        self._offsets = np.r_[0, np.cumsum(sizes)]
+        self._row_by_geoid = {geoid: i for i, geoid in enumerate(self._index.GEOID)}
+        for group in range(self._file.num_row_groups):
+            self._group_by_state[self._index.STATEFP.iat[self._offsets[group]]] = group
+        self._bbox = self._index[["minx", "miny", "maxx", "maxy"]].to_numpy()
+        return self
+
+    @property
+    def index(self):
+        """GEOID, STATEFP and bounding box of every county, without geometry."""
+        return self._index
+
+    def _read_groups(self, groups, columns=None):
+        table = self._file.read_row_groups(list(groups), columns=columns)
+        df = table.to_pandas()
+        if "geometry" not in df.columns:
+            return df
+        geometry = gpd.GeoSeries.from_wkb(df.pop("geometry"), crs=self._crs)
+        return gpd.GeoDataFrame(df, geometry=geometry, crs=self._crs)
+
+    def state(self, statefp, columns=None):
+        """All counties of the state with 2-digit FIPS code statefp."""
+        group = self._group_by_state.get(statefp)
+        if group is None:
+            raise KeyError("Unknown state FIPS code %r" % statefp)
+        return self._read_groups([group], columns)
+
+    def county(self, geoid, columns=None):
+        """The county with 5-digit state+county FIPS code geoid, as a one-row frame."""
+        row = self._row_by_geoid.get(geoid)
+        if row is None:
+            raise KeyError("Unknown county GEOID %r" % geoid)
+        group = int(np.searchsorted(self._offsets, row, side="right")) - 1
+        df = self._read_groups([group], columns)
+        return df.iloc[[row - self._offsets[group]]].reset_index(drop=True)
+
+    def bbox(self, minx, miny, maxx, maxy, columns=None):
+        """Counties whose bounding box intersects the given lon/lat box."""
+        b = self._bbox
+        hits = np.flatnonzero((b[:, 0] <= maxx) & (b[:, 2] >= minx) & (b[:, 1] <= maxy) & (b[:, 3] >= miny))
+        if len(hits) == 0:
+            return self._read_groups([], columns)
+        groups = np.unique(np.searchsorted(self._offsets, hits, side="right") - 1)
+        df = self._read_groups(groups, columns)
+        # Rows of df are the selected row groups laid end to end.
+        rows = np.concatenate([np.arange(self._offsets[g], self._offsets[g + 1]) for g in groups])
+        return df.iloc[np.flatnonzero(np.isin(rows, hits))].reset_index(drop=True)
+
+    def all(self, columns=None):
+        """Every county. Reads the whole file, so prefer state()/county()/bbox()."""
+        return self._read_groups(range(self._file.num_row_groups), columns)
@@ -0,0 +1,113 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+H3 coverage polygons for a county or state.
+
+The cells filling a county (5-digit GEOID) or state (2-digit STATEFP),
+polyfilled on an outline simplified to match the resolution, are turned into
+a GeoDataFrame in one pass: boundary rings come from the shared boundary
+cache and all polygons are created by a single shapely call. Each
+(code, resolution) result is written to GeoParquet so later requests just
+read it back.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+import geopandas as gpd
+import h3
+import shapely
+
+from yelpmap import DATA_DIR
+from yelpmap.atomic import atomic_path
+from yelpmap.hexjson import boundary_cache
+from yelpmap.simplify import level_for_resolution
+
+CRS = 'EPSG:4269'
+
+
+def poly_geojson(poly):
+    """GeoJSON geometry dict of a shapely geometry (or one-element GeoSeries)."""
+    poly_geojson = gpd.GeoSeries(poly).__geo_interface__
+    return poly_geojson['features'][0]['geometry']
+
+
+def hexes_to_frame(hexes, crs=CRS, cache=None):
+    """GeoDataFrame with hex_id and polygon geometry for a list of hex IDs."""
+    if cache is None:
+        cache = boundary_cache
+    hexes = list(hexes)
+    rings = [cache.get(h) for h in hexes]
+    if not rings:
+        return gpd.GeoDataFrame({'hex_id': []}, geometry=gpd.GeoSeries([], crs=crs), crs=crs)
+    lengths = np.fromiter((len(r) for r in rings), dtype=np.intp, count=len(rings))
+    linearrings = shapely.linearrings(np.concatenate(rings), indices=np.repeat(np.arange(len(rings)), lengths))
+    return gpd.GeoDataFrame({'hex_id': hexes}, geometry=shapely.polygons(linearrings), crs=crs)
+
+
+class CoverageStore:
+    """
+    Persisted hex coverage per (GEOID or STATEFP, resolution). Outlines come
+    from a GeometryLOD at the level of detail matching the resolution.
+    """
+
+    def __init__(self, geometries, directory=os.path.join(DATA_DIR, 'coverage')):
+        self.geometries = geometries
+        self.directory = directory
+        self._building = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, code, resolution):
+        return os.path.join(self.directory, '%s_r%d.parquet' % (code, resolution))
+
+    def outline(self, code, resolution):
+        """GeoJSON geometry of the county (5-digit code) or state (2-digit code)."""
+        level = level_for_resolution(resolution)
+        if len(code) == 5:
+            return poly_geojson(self.geometries.county(code, level).geometry)
+        if len(code) == 2:
+            return poly_geojson(self.geometries.state(code, level).geometry)
+        raise ValueError("Expected a 5-digit county GEOID or 2-digit state FIPS code, got %r" % code)
+
+    def build(self, code, resolution):
+        outline = self.outline(code, resolution)
+        if outline['type'] == 'MultiPolygon':
+            # h3.polyfill_geojson only takes Polygons (islands, coastal states).
+            fillhexes = set()
+            for coordinates in outline['coordinates']:
+                fillhexes |= h3.polyfill_geojson({'type': 'Polygon', 'coordinates': coordinates}, resolution)
+        else:
+            fillhexes = h3.polyfill_geojson(outline, resolution)
+        return hexes_to_frame(sorted(fillhexes))
+
+    def get(self, code, resolution):
+        """Coverage GeoDataFrame (hex_id, geometry), built and saved on first use."""
+        path = self.path(code, resolution)
+        if os.path.exists(path):
+            return gpd.read_parquet(path)
+        # Concurrent requests for the same coverage build it once; the rest wait and read it.
+        with self._lock:
+            building = self._building.setdefault((code, resolution), threading.Lock())
+        with building:
+            if os.path.exists(path):
+                return gpd.read_parquet(path)
+            frame = self.build(code, resolution)
+            # Other processes (precompute workers) may be writing the same file.
+            with atomic_path(path) as tmp_path:
+                frame.to_parquet(tmp_path)
+            return frame
@@ -0,0 +1,104 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Server-side point density for heat layers.
+
+Points are binned onto a lon/lat grid sized to the map bounds and zoom with
+np.histogram2d, optionally smoothed with a separable Gaussian kernel, and
+returned as [lat, lon, weight] cell centres. The number of cells depends on
+the grid, never on the number of points.
+"""
+
+import numpy as np
+
+# Leaflet tiles are 256 px; at zoom z the world is 256 * 2**z px wide.
+TILE_SIZE = 256
+MAX_CELLS = 40_000
+
+
+def grid_shape(bounds, zoom, cell_px=8, max_cells=MAX_CELLS):
+    """
+    (rows, cols) of a grid with cells about cell_px screen pixels wide over
+    bounds = (south, west, north, east) at the given zoom, capped at max_cells.
+    """
+    south, west, north, east = bounds
+    deg_per_cell = 360.0 / (TILE_SIZE * 2 ** zoom) * cell_px
+    cols = max(1, int(np.ceil((east - west) / deg_per_cell)))
+    # Use the mid-latitude to keep cells roughly square on screen.
+    rows = max(1, int(np.ceil((north - south) / (deg_per_cell * np.cos(np.radians((north + south) / 2))))))
+    scale = np.sqrt(max_cells / float(rows * cols))
+    if scale < 1:
+        rows = max(1, int(rows * scale))
+        cols = max(1, int(cols * scale))
+    return rows, cols
+
+
+def _gaussian_kernel(sigma):
+    radius = max(1, int(np.ceil(3 * sigma)))
+    x = np.arange(-radius, radius + 1)
+    k = np.exp(-0.5 * (x / sigma) ** 2)
+    return k / k.sum()
+
+
+def smooth(grid, sigma):
+    """Separable Gaussian blur of a 2-D grid (sigma in cells), same shape out."""
+    k = _gaussian_kernel(sigma)
+    radius = len(k) // 2
+
+    def blur(v):
+        return np.convolve(np.pad(v, radius), k, mode='valid')
+
+    return np.apply_along_axis(blur, 1, np.apply_along_axis(blur, 0, grid))
+
+
+def density_cells(lat, lon, bounds=None, zoom=9, cell_px=8, sigma=None, weights=None,
+                  max_cells=MAX_CELLS, normalize=True):
+    """
+    [[lat, lon, weight], ...] for every non-empty grid cell.
+
+    bounds defaults to the points' extent. sigma (in cells) turns the
+    histogram into a kernel density. With normalize, weights are scaled to
+    0-1 so the heat layer's colour ramp uses its full range.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    ok = ~(np.isnan(lat) | np.isnan(lon))
+    lat, lon = lat[ok], lon[ok]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[ok]
+    if len(lat) == 0:
+        return []
+
+    if bounds is None:
+        bounds = (lat.min(), lon.min(), lat.max(), lon.max())
+    south, west, north, east = bounds
+    if north <= south:
+        north = south + 1e-6
+    if east <= west:
+        east = west + 1e-6
+
+    rows, cols = grid_shape((south, west, north, east), zoom, cell_px, max_cells)
+    grid, lat_edges, lon_edges = np.histogram2d(lat, lon, bins=(rows, cols),
+                                                range=((south, north), (west, east)), weights=weights)
+    if sigma:
+        grid = smooth(grid, sigma)
+
+    r, c = np.nonzero(grid > 0)
+    values = grid[r, c]
+    if normalize and len(values):
+        values = values / values.max()
+    lat_mid = (lat_edges[:-1] + lat_edges[1:]) / 2
+    lon_mid = (lon_edges[:-1] + lon_edges[1:]) / 2
+    return np.column_stack([lat_mid[r], lon_mid[c], values]).round(6).tolist()
@@ -0,0 +1,114 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Batch H3 indexing on NumPy arrays.
+
+Cells are handled as uint64 arrays; they are only turned into the usual hex
+strings (one format() per distinct cell) when a frame needs a hex_id column.
+Large inputs can be split into chunks and indexed on a process pool.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import h3.api.numpy_int as h3_int
+
+try:
+    from h3.unstable import vect as _vect
+except ImportError:  # older h3 builds without the vectorized API
+    _vect = None
+
+# Below this many points a process pool costs more than it saves.
+PARALLEL_MIN_POINTS = 500_000
+
+# Forking a multi-threaded process (the Streamlit server) can deadlock the
+# child on a lock some other thread held; start workers from a clean process.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+
+def _geo_to_h3(lat, lon, resolution):
+    if _vect is not None:
+        return _vect.geo_to_h3(lat, lon, resolution)
+    return np.fromiter((h3_int.geo_to_h3(a, b, resolution) for a, b in zip(lat, lon)),
+                       dtype=np.uint64, count=len(lat))
+
+
+def parents(ids, resolution):
+    """Parent cells of a uint64 cell array at a coarser resolution."""
+    ids = np.asarray(ids, dtype=np.uint64)
+    if _vect is not None and hasattr(_vect, "h3_to_parent"):
+        return _vect.h3_to_parent(ids, resolution)
+    # Parents repeat a lot, so only resolve each distinct cell once.
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    out = np.fromiter((h3_int.h3_to_parent(int(h), resolution) for h in uniq), dtype=np.uint64, count=len(uniq))
+    return out[inverse]
+
+
+def _index_chunk(args):
+    lat, lon, resolutions = args
+    # Each resolution is indexed from the points: a parent cell does not always
+    # contain its children's points, so parents() can disagree with geo_to_h3
+    # near cell edges.
+    return {res: _geo_to_h3(lat, lon, res) for res in resolutions}
+
+
+def hex_ids(lat, lon, resolution, workers=None, chunk_size=250_000):
+    """
+    H3 cells of every (lat, lon) pair as a uint64 array.
+
+    resolution may be an int or a sequence of ints; for a sequence a dict
+    {resolution: array} is returned, each indexed directly from the points.
+    workers > 1 spreads chunks of large inputs over a process pool.
+    """
+    lat = np.ascontiguousarray(lat, dtype=np.float64)
+    lon = np.ascontiguousarray(lon, dtype=np.float64)
+    single = np.isscalar(resolution)
+    resolutions = sorted({int(resolution)} if single else {int(r) for r in resolution})
+
+    if workers and workers > 1 and len(lat) >= PARALLEL_MIN_POINTS:
+        bounds = range(0, len(lat), chunk_size)
+        chunks = [(lat[i:i + chunk_size], lon[i:i + chunk_size], resolutions) for i in bounds]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as pool:
+            parts = list(pool.map(_index_chunk, chunks))
+        result = {res: np.concatenate([p[res] for p in parts]) for res in resolutions}
+    else:
+        result = _index_chunk((lat, lon, resolutions))
+
+    return result[resolutions[0]] if single else result
+
+
+def to_strings(ids):
+    """uint64 cells -> object array of the hex strings h3.geo_to_h3 returns."""
+    ids = np.asarray(ids, dtype=np.uint64)
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    strings = np.array([format(int(h), 'x') for h in uniq], dtype=object)
+    return strings[inverse]
+
+
+def to_ints(strings):
+    """Hex-string cells -> uint64 array."""
+    strings = np.asarray(strings, dtype=object)
+    uniq, inverse = np.unique(strings, return_inverse=True)
+    ints = np.fromiter((int(s, 16) for s in uniq), dtype=np.uint64, count=len(uniq))
+    return ints[inverse]
+
+
+def hexify(df, resolution=7, workers=None):
+    """df with a hex_id column (hex strings) computed from its Lat/Lon columns."""
+    ids = hex_ids(df.Lat.values, df.Lon.values, resolution, workers=workers)
+    return df.assign(hex_id=to_strings(ids))
@@ -0,0 +1,173 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+GeoJSON for H3 cells.
+
+Cell boundaries are cached by hex ID across calls, features are encoded in
+batches by the C json encoder and written to a stream as they are produced.
+Coordinates are rounded to `precision` decimals (6 is ~10 cm) to keep the
+payload small. Cells that cannot be converted are collected in a report
+instead of being printed.
+"""
+
+import io
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import h3
+
+from yelpmap.cache import CacheStats
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PRECISION = 6
+BATCH_SIZE = 10_000
+
+
+# Per-entry cost beyond the ring array and the key: the OrderedDict's hash
+# slot and linked-list node.
+_ENTRY_OVERHEAD = 100
+
+
+def _entry_bytes(hex_id, ring):
+    return sys.getsizeof(ring) + sys.getsizeof(hex_id) + _ENTRY_OVERHEAD
+
+
+class BoundaryCache:
+    """
+    LRU of hex ID -> closed (lng, lat) boundary ring as a float64 array,
+    bounded by the approximate memory its entries take (about 300 bytes
+    each), so the module-global cache stays small in the long-lived server
+    and in every precompute worker.
+    """
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._rings = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._rings)
+
+    def clear(self):
+        with self._lock:
+            self._rings.clear()
+            self._bytes = 0
+
+    def get(self, hex_id):
+        with self._lock:
+            ring = self._rings.get(hex_id)
+            if ring is not None:
+                self._rings.move_to_end(hex_id)
+                self.stats.hits += 1
+                return ring
+            self.stats.misses += 1
+        # Raises for invalid cells; the caller reports them.
+        ring = np.array(h3.h3_to_geo_boundary(hex_id, geo_json=True), dtype=np.float64)
+        with self._lock:
+            if hex_id not in self._rings:
+                self._rings[hex_id] = ring
+                self._bytes += _entry_bytes(hex_id, ring)
+            while self._bytes > self.max_bytes and self._rings:
+                evicted, evicted_ring = self._rings.popitem(last=False)
+                self._bytes -= _entry_bytes(evicted, evicted_ring)
+                self.stats.evictions += 1
+        return ring
+
+
+boundary_cache = BoundaryCache()
+
+
+class SerializeReport:
+    """Outcome of a serialization: features written and (hex_id, error) pairs for the rest."""
+
+    def __init__(self):
+        self.features = 0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return "SerializeReport(features=%d, errors=%d)" % (self.features, len(self.errors))
+
+
+def write_hex_geojson(out, hex_ids, properties=None, precision=DEFAULT_PRECISION, cache=None):
+    """
+    Stream a FeatureCollection with one Polygon per cell into the text stream out.
+
+    properties maps property names to sequences aligned with hex_ids. Each
+    feature also gets the hex ID as its id. Returns a SerializeReport.
+    """
+    if cache is None:
+        cache = boundary_cache
+    hex_ids = list(hex_ids)
+    columns = {name: np.asarray(values).tolist() for name, values in (properties or {}).items()}
+    report = SerializeReport()
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+
+    out.write('{"type":"FeatureCollection","features":[')
+    first = True
+    for start in range(0, len(hex_ids), BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + BATCH_SIZE, len(hex_ids))):
+            hex_id = hex_ids[i]
+            try:
+                ring = cache.get(hex_id)
+            except Exception as e:
+                report.errors.append((hex_id, "%s: %s" % (type(e).__name__, e)))
+                continue
+            batch.append({
+                "type": "Feature",
+                "id": hex_id,
+                "geometry": {"type": "Polygon", "coordinates": [np.round(ring, precision).tolist()]},
+                "properties": {name: values[i] for name, values in columns.items()},
+            })
+        if batch:
+            if not first:
+                out.write(',')
+            out.write(dumps(batch)[1:-1])
+            first = False
+            report.features += len(batch)
+    out.write(']}')
+
+    if report.errors:
+        LOGGER.warning("Skipped %d of %d hexes that could not be converted to GeoJSON, e.g. %s",
+                       len(report.errors), len(hex_ids), report.errors[0])
+    return report
+
+
+def hex_df_to_geojson(df_hex, column_name="value", precision=DEFAULT_PRECISION, columns=()):
+    """
+    GeoJSON string for a frame with a hex_id column, with column_name (and any
+    extra columns) as feature properties. Use write_hex_geojson directly to
+    stream into a file or to get the SerializeReport.
+    """
+    properties = {c: df_hex[c].values for c in [column_name, *columns]}
+    buffer = io.StringIO()
+    write_hex_geojson(buffer, df_hex["hex_id"].values, properties, precision)
+    return buffer.getvalue()
@@ -0,0 +1,61 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shared cache of rendered folium maps.
+
+Maps are keyed on a content hash of the input frame plus every rendering
+parameter and stored as their standalone HTML in a TieredCache, so any
+session asking for the same map reuses one build.
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from yelpmap import DATA_DIR
+from yelpmap.cache import TieredCache
+
+
+def frame_digest(df):
+    """Content hash of a DataFrame: values, index, column names and dtypes."""
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    return h.hexdigest()
+
+
+def map_key(df, **params):
+    """Cache key for the map of df rendered with params."""
+    return frame_digest(df) + ':' + json.dumps(params, sort_keys=True, default=str)
+
+
+def render_html(m):
+    """Standalone HTML document of a folium map (or figure)."""
+    return m.get_root().render()
+
+
+class MapCache(TieredCache):
+    """TieredCache of map HTML, sized in bytes of HTML."""
+
+    def __init__(self, directory=os.path.join(DATA_DIR, 'cache', 'maps'), ttl=24 * 3600,
+                 max_entries=64, max_bytes=128 << 20, disk_max_bytes=1 << 30):
+        super().__init__(directory=directory, ttl=ttl, max_entries=max_entries,
+                         max_bytes=max_bytes, disk_max_bytes=disk_max_bytes)
+
+    def html(self, df, build, **params):
+        """HTML of the map build() returns for df and params, built at most once."""
+        return self.get_or_compute(map_key(df, **params), lambda: render_html(build()))
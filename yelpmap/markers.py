@@ -0,0 +1,62 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bulk business marker layer.
+
+All points go to the browser as one [lat, lon, name, rating] array and are
+clustered client-side by Leaflet.markercluster. Popups are built from the
+row only when a marker is opened, so there is no per-point DOM or iframe.
+"""
+
+import numpy as np
+
+from folium.plugins import FastMarkerCluster
+
+# Coordinates are rounded to 5 decimals (~1 m) to keep the array small.
+PRECISION = 5
+
+POPUP_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(function () {
+        var name = document.createElement('span');
+        name.textContent = row[2];
+        var el = document.createElement('div');
+        el.innerHTML = '<b>Name:</b> ';
+        el.appendChild(name);
+        el.insertAdjacentHTML('beforeend', '<br><b>Rating:</b> ' + row[3]);
+        return el;
+    }, {minWidth: 200});
+    return marker;
+}
+"""
+
+
+def marker_rows(df):
+    """[lat, lon, name, rating] for every business with coordinates."""
+    ok = df.Lat.notna().values & df.Lon.notna().values
+    lat = np.round(df.Lat.values[ok].astype(np.float64), PRECISION).tolist()
+    lon = np.round(df.Lon.values[ok].astype(np.float64), PRECISION).tolist()
+    names = df.Name.astype(str).values[ok].tolist() if 'Name' in df else [''] * len(lat)
+    if 'Rating' in df:
+        ratings = [None if r != r else r for r in df.Rating.values[ok].astype(np.float64).tolist()]
+    else:
+        ratings = [None] * len(lat)
+    return [list(row) for row in zip(lat, lon, names, ratings)]
+
+
+def marker_layer(df, name="Locations"):
+    """Clustered marker layer for a frame with Lat/Lon (and Name/Rating) columns."""
+    return FastMarkerCluster(marker_rows(df), callback=POPUP_CALLBACK, name=name)
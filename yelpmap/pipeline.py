@@ -0,0 +1,133 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Staged, cancellable background work for a Streamlit page.
+
+A Pipeline holds the futures of one set of page inputs. Stages are
+submitted by name to a shared thread pool, so independent stages overlap,
+and a rerun with the same inputs picks up the same futures. When the
+inputs change, session_pipeline cancels the old pipeline: pending stages
+never start, and running ones can poll `cancelled` to stop early.
+
+Streamlit only stops a stale script run at its next st.* call, so the
+script must not block on a future: wait() and progressive() call a tick()
+that touches the page every `interval` seconds while they wait.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, wait as wait_futures
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # streamlit < 1.18
+    from streamlit.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+class Pipeline:
+    def __init__(self, executor, key):
+        self.executor = executor
+        self.key = key
+        self.cancelled = threading.Event()
+        # name -> (started as time.time(), seconds) of every finished stage.
+        self.timings = {}
+        self._futures = {}
+
+    def submit(self, name, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool as stage `name`, unless that stage
+        was already submitted for these inputs. A stage that failed is run
+        again, so a transient error isn't replayed on every rerun. Returns its
+        Future.
+        """
+        future = self._futures.get(name)
+        if future is not None and not _failed(future):
+            return future
+        # Workers get the page's script context so st.cache_* and st.secrets work there.
+        ctx = get_script_run_ctx()
+
+        def run():
+            if self.cancelled.is_set():
+                raise CancelledError()
+            if ctx is not None:
+                add_script_run_ctx(threading.current_thread(), ctx)
+            started = time.time()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.timings[name] = (started, time.perf_counter() - start)
+
+        future = self._futures[name] = self.executor.submit(run)
+        return future
+
+    def wait(self, future, tick, interval=0.25):
+        """future.result(), calling tick() every interval seconds until it is done."""
+        while not wait_futures([future], timeout=interval).done:
+            tick()
+        return future.result()
+
+    def cancel(self):
+        self.cancelled.set()
+        for future in self._futures.values():
+            future.cancel()
+
+    def progressive(self, names, tick, on_error=None, interval=0.25):
+        """
+        Yield (name, result) as the given stages finish, skipping any stage
+        that finishes after a later one (in `names` order) was already yielded,
+        so a display only ever moves forward. tick() is called every interval
+        seconds while nothing finishes. A stage that fails is passed to
+        on_error(name, exception) and skipped, so later stages still show;
+        without on_error its exception is raised.
+        """
+        order = {self._futures[name]: i for i, name in enumerate(names)}
+        pending = set(order)
+        shown = -1
+        while pending:
+            done, pending = wait_futures(pending, timeout=interval, return_when=FIRST_COMPLETED)
+            if not done:
+                tick()
+                continue
+            for future in sorted(done, key=order.get):
+                i = order[future]
+                if i <= shown:
+                    continue
+                if on_error is not None and _failed(future):
+                    on_error(names[i], future.exception())
+                    continue
+                shown = i
+                yield names[i], future.result()
+
+
+def _failed(future):
+    """Whether future finished with an exception other than a cancellation."""
+    if not future.done() or future.cancelled():
+        return False
+    return not isinstance(future.exception(), (type(None), CancelledError))
+
+
+def session_pipeline(state, executor, key):
+    """
+    The Pipeline for `key` stored in the session state mapping `state`,
+    replacing (and cancelling) the previous one when key has changed.
+    """
+    current = state.get('pipeline')
+    if current is not None and current.key == key:
+        return current
+    if current is not None:
+        current.cancel()
+    state['pipeline'] = Pipeline(executor, key)
+    return state['pipeline']
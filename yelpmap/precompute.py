@@ -0,0 +1,214 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline batch precompute for the Mapping page.
+
+    python -m yelpmap.precompute jobs.csv [--workers N] [--fixtures DIR]
+
+jobs.csv has the columns location, term, resolution and optionally fill (a
+county GEOID or state FIPS code whose hex coverage should be built too).
+Jobs are grouped by search and the searches spread over a process pool, so
+each search is fetched once however many resolutions it has. Its businesses
+and the hex aggregates of each resolution go into the versioned
+AggregateStore, with one manifest of per-stage timings per job; fill
+coverage goes into the CoverageStore the page reads. Jobs whose manifest
+already exists are skipped, so an interrupted run can simply be started
+again.
+
+Businesses come from the Yelp API (key in $YELP_API_KEY or --api-key) or,
+with --fixtures DIR, from DIR/<location>__<term>.json files holding a list
+of Yelp business dicts.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from yelpmap import DATA_DIR
+from yelpmap.businesses import businesses_to_frame
+from yelpmap.counties import CountyStore
+from yelpmap.coverage import CoverageStore
+from yelpmap.pyramid import HexPyramid
+from yelpmap.simplify import GeometryLOD
+from yelpmap.store import STORED_AGGS, AggregateStore, slug
+from yelpmap.yelp import YelpClient
+
+STAGES = ('fetch', 'hexify', 'coverage', 'write')
+
+# Set per worker process by open_geometries(); built once in the parent first.
+_coverage = None
+
+
+def open_geometries():
+    """Open the county store and its levels of detail in this process (pool initializer)."""
+    global _coverage
+    _coverage = CoverageStore(GeometryLOD(CountyStore().open()).open())
+
+
+def read_jobs(path):
+    """Jobs from a CSV file as dicts with location, term, resolution (int) and fill."""
+    with open(path, newline='') as f:
+        jobs = []
+        for row in csv.DictReader(f):
+            jobs.append({
+                'location': row['location'].strip(),
+                'term': row['term'].strip(),
+                'resolution': int(row['resolution']),
+                'fill': (row.get('fill') or '').strip() or None,
+            })
+    return jobs
+
+
+def fixture_businesses(fixtures, location, term):
+    path = os.path.join(fixtures, '%s__%s.json' % (slug(location), slug(term)))
+    with open(path) as f:
+        return businesses_to_frame([json.load(f)])
+
+
+def group_jobs(jobs):
+    """Jobs grouped by search: a list of lists sharing location and term, in first-seen order."""
+    groups = {}
+    for job in jobs:
+        groups.setdefault((slug(job['location']), slug(job['term'])), []).append(job)
+    return list(groups.values())
+
+
+def run_search(jobs, store_root, fixtures=None, api_key=None, rate=5.0):
+    """
+    Run the jobs of one search (same location and term) in the current
+    process: fetch its businesses once, then hexify, build coverage and
+    write each resolution. Returns their manifests.
+    """
+    store = AggregateStore(store_root)
+    location, term = jobs[0]['location'], jobs[0]['term']
+
+    start = time.perf_counter()
+    df = store.businesses(location, term)
+    if df is None:
+        if fixtures:
+            df = fixture_businesses(fixtures, location, term)
+        else:
+            client = YelpClient(api_key, rate=rate)
+            try:
+                df = businesses_to_frame(client.iter_pages(location, term))
+            finally:
+                client.close()
+    store.write_frame(location, term, 'businesses.parquet', df)
+    fetched = time.perf_counter() - start
+
+    # The same pyramid the page builds, so stored and page-built levels agree.
+    start = time.perf_counter()
+    resolutions = [job['resolution'] for job in jobs]
+    pyramid = HexPyramid.from_frame(df, finest=max(resolutions), coarsest=min(resolutions))
+    indexed = time.perf_counter() - start
+
+    manifests = []
+    for i, job in enumerate(jobs):
+        res = job['resolution']
+        # The fetch and the indexing pass are shared; they count towards the first job.
+        timings = {'fetch': fetched if i == 0 else 0.0}
+
+        start = time.perf_counter()
+        hexes = pyramid.level(res, STORED_AGGS)
+        timings['hexify'] = time.perf_counter() - start + (indexed if i == 0 else 0.0)
+
+        start = time.perf_counter()
+        coverage = None
+        if job['fill']:
+            if _coverage is None:
+                open_geometries()
+            coverage = _coverage.get(job['fill'], res)
+        timings['coverage'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.write_frame(location, term, 'hexes_r%d.parquet' % res, hexes)
+        timings['write'] = time.perf_counter() - start
+
+        manifest = dict(job, rows=len(df), hexes=len(hexes),
+                        coverage_hexes=None if coverage is None else len(coverage),
+                        timings=timings, finished=time.time())
+        store.write_manifest(location, term, res, manifest)
+        manifests.append(manifest)
+    return manifests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('jobs', help='CSV file with location, term, resolution[, fill] columns')
+    parser.add_argument('--store', default=os.path.join(DATA_DIR, 'store'), help='store root (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes (default: %(default)s)')
+    parser.add_argument('--fixtures', help='directory of <location>__<term>.json business lists to use instead of the API')
+    parser.add_argument('--api-key', default=os.environ.get('YELP_API_KEY'), help='Yelp API key (default: $YELP_API_KEY)')
+    parser.add_argument('--rate', type=float, default=5.0, help='API requests per second, shared by all workers')
+    parser.add_argument('--force', action='store_true', help='rerun jobs that already have a manifest')
+    args = parser.parse_args(argv)
+
+    if not args.fixtures and not args.api_key:
+        parser.error('set $YELP_API_KEY, pass --api-key, or use --fixtures')
+
+    store = AggregateStore(args.store)
+    jobs = read_jobs(args.jobs)
+    todo = [j for j in jobs if args.force or not store.done(j['location'], j['term'], j['resolution'])]
+    searches = group_jobs(todo)
+    print('%d jobs, %d already done, %d to run (%d searches) on %d workers'
+          % (len(jobs), len(jobs) - len(todo), len(todo), len(searches), args.workers))
+
+    initializer = None
+    if any(job['fill'] for job in todo):
+        # Download and build the county stores here, once, instead of in every worker.
+        open_geometries()
+        initializer = open_geometries
+
+    totals = dict.fromkeys(STAGES, 0.0)
+    rows = 0
+    failed = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=initializer) as pool:
+        futures = {pool.submit(run_search, group, args.store, args.fixtures, args.api_key,
+                               args.rate / max(1, args.workers)): group for group in searches}
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                manifests = future.result()
+            except Exception as e:
+                failed += len(group)
+                name = '%s / %s / r%s' % (group[0]['location'], group[0]['term'],
+                                         ','.join(str(job['resolution']) for job in group))
+                print('FAILED %s: %s: %s' % (name, type(e).__name__, e), file=sys.stderr)
+                continue
+            for manifest in manifests:
+                name = '%s / %s / r%d' % (manifest['location'], manifest['term'], manifest['resolution'])
+                t = manifest['timings']
+                for stage in STAGES:
+                    totals[stage] += t[stage]
+                print('done   %s: %d rows, %d hexes | %s'
+                      % (name, manifest['rows'], manifest['hexes'],
+                         ' '.join('%s %.2fs' % (stage, t[stage]) for stage in STAGES)))
+            rows += manifests[0]['rows']
+
+    elapsed = time.perf_counter() - started
+    print('stage totals: ' + ' '.join('%s %.2fs' % (stage, totals[stage]) for stage in STAGES))
+    print('%d jobs in %.2fs (%.2f jobs/s, %.0f rows/s), %d failed'
+          % (len(todo) - failed, elapsed, (len(todo) - failed) / elapsed if elapsed else 0,
+             rows / elapsed if elapsed else 0, failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
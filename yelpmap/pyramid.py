@@ -0,0 +1,159 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Multi-resolution H3 aggregation pyramid.
+
+Points are indexed at every resolution in one pass and reduced to per-cell
+row counts, sums and non-null counts, so each level matches geo_to_h3 plus
+a groupby exactly. Counts, sums and means of any numeric column can then be
+read off any level.
+
+rollup=True instead indexes only the finest resolution and rolls coarser
+levels up through H3 parents. That is cheaper, but H3 parents are not
+exact: near a cell edge a point's parent can differ from the cell geo_to_h3
+puts it in, so rolled-up counts are approximate.
+"""
+
+import numpy as np
+import pandas as pd
+
+from yelpmap.hexes import hex_ids, parents, to_strings
+
+FINEST = 9
+COARSEST = 5
+
+
+class _Level:
+    """Aggregates of one resolution: sorted unique cells and per-cell totals."""
+
+    def __init__(self, cells, rows, sums, valid):
+        self.cells = cells
+        self.rows = rows
+        self.sums = sums
+        self.valid = valid
+
+    @classmethod
+    def empty(cls, columns):
+        return cls(np.array([], dtype=np.uint64), np.array([], dtype=np.int64),
+                   {c: np.array([], dtype=np.float64) for c in columns},
+                   {c: np.array([], dtype=np.int64) for c in columns})
+
+    @classmethod
+    def reduce(cls, cells, rows, sums, valid):
+        """Group possibly repeated cells and add up their totals."""
+        uniq, inverse = np.unique(cells, return_inverse=True)
+        n = len(uniq)
+        return cls(
+            uniq,
+            np.bincount(inverse, weights=rows, minlength=n).astype(np.int64),
+            {c: np.bincount(inverse, weights=v, minlength=n) for c, v in sums.items()},
+            {c: np.bincount(inverse, weights=v, minlength=n).astype(np.int64) for c, v in valid.items()},
+        )
+
+    def merge(self, other):
+        return _Level.reduce(
+            np.concatenate([self.cells, other.cells]),
+            np.concatenate([self.rows, other.rows]),
+            {c: np.concatenate([self.sums[c], other.sums[c]]) for c in self.sums},
+            {c: np.concatenate([self.valid[c], other.valid[c]]) for c in self.valid},
+        )
+
+    def rollup(self, resolution):
+        return _Level.reduce(parents(self.cells, resolution), self.rows, self.sums, self.valid)
+
+
+class HexPyramid:
+    """
+    Aggregates for every resolution from coarsest to finest.
+
+    columns are the numeric columns whose sum/mean should be available. Feed
+    points with add() (repeatedly, e.g. once per chunk) and read a level with
+    level(). With rollup=True coarser levels are approximated from the finest
+    one (see the module docstring) and rebuilt lazily after new points arrive.
+    """
+
+    def __init__(self, finest=FINEST, coarsest=COARSEST, columns=(), rollup=False):
+        if coarsest > finest:
+            raise ValueError("coarsest (%d) must not be finer than finest (%d)" % (coarsest, finest))
+        self.finest = finest
+        self.coarsest = coarsest
+        self.columns = list(columns)
+        self.rollup = rollup
+        indexed = [finest] if rollup else self.resolutions
+        self._levels = {res: _Level.empty(self.columns) for res in indexed}
+        self._stale = rollup
+
+    @classmethod
+    def from_frame(cls, df, finest=FINEST, coarsest=COARSEST, columns=('Rating', 'RatingCount'), workers=None,
+                   rollup=False):
+        columns = [c for c in columns if c in df.columns]
+        pyramid = cls(finest, coarsest, columns, rollup=rollup)
+        return pyramid.add(df.Lat.values, df.Lon.values, {c: df[c].values for c in columns}, workers=workers)
+
+    @property
+    def resolutions(self):
+        return range(self.coarsest, self.finest + 1)
+
+    def add(self, lat, lon, values=None, workers=None):
+        """Aggregate a batch of points (and their column values) into the pyramid."""
+        values = values or {}
+        indexed = [self.finest] if self.rollup else list(self.resolutions)
+        cells = hex_ids(lat, lon, indexed, workers=workers)
+        rows = np.ones(len(lat), dtype=np.int64)
+        sums = {}
+        valid = {}
+        for c in self.columns:
+            v = np.asarray(values[c], dtype=np.float64)
+            ok = ~np.isnan(v)
+            sums[c] = np.where(ok, v, 0.0)
+            valid[c] = ok.astype(np.int64)
+        levels = {res: self._levels[res].merge(_Level.reduce(cells[res], rows, sums, valid)) for res in indexed}
+        self._levels = levels
+        self._stale = self.rollup
+        return self
+
+    def _build(self):
+        below = self._levels[self.finest]
+        for res in range(self.finest - 1, self.coarsest - 1, -1):
+            below = self._levels[res] = below.rollup(res)
+        self._stale = False
+
+    def level(self, resolution, aggs=None):
+        """
+        DataFrame with a hex_id column and one column per aggregate.
+
+        aggs maps output names to (column, func) with func one of 'count',
+        'sum' or 'mean'; a 'count' with column None counts rows. The default
+        is {'counts': (None, 'count')}, i.e. groupby('hex_id').size().
+        """
+        if resolution not in self.resolutions:
+            raise ValueError("resolution %d is outside the pyramid (%d-%d)"
+                             % (resolution, self.coarsest, self.finest))
+        if self._stale:
+            self._build()
+        lvl = self._levels[resolution]
+
+        out = {'hex_id': to_strings(lvl.cells)}
+        for name, (column, func) in (aggs or {'counts': (None, 'count')}).items():
+            if func == 'count':
+                out[name] = lvl.rows if column is None else lvl.valid[column]
+            elif func == 'sum':
+                out[name] = lvl.sums[column]
+            elif func == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    out[name] = lvl.sums[column] / lvl.valid[column]
+            else:
+                raise ValueError("Unknown aggregate %r; use 'count', 'sum' or 'mean'" % func)
+        return pd.DataFrame(out)
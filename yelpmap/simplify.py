@@ -0,0 +1,111 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Level-of-detail pyramid for county and state boundaries.
+
+Every level is a CountyStore file: counties simplified with shapely's
+topology-preserving simplify at one tolerance, and states dissolved from
+the full-resolution counties once and then simplified. Level 0 is full
+detail. Callers pick a level from an H3 resolution or a map zoom, so only
+the vertices that level needs are ever read.
+"""
+
+import os
+
+import numpy as np
+
+from yelpmap.counties import DATA_DIR, CountyStore, write_store
+
+# Simplification tolerance of each level, in degrees (0.001 deg is ~100 m).
+TOLERANCES = (0.0, 0.0005, 0.002, 0.008, 0.03)
+
+# Average H3 hexagon edge length per resolution, in degrees of latitude.
+_H3_EDGE_DEG = {0: 9.9, 1: 3.7, 2: 1.4, 3: 0.53, 4: 0.2, 5: 0.077, 6: 0.029,
+                7: 0.011, 8: 0.0041, 9: 0.0016, 10: 0.00059}
+
+
+def level_for_tolerance(tolerance):
+    """Coarsest level whose tolerance does not exceed the given one."""
+    return int(np.searchsorted(TOLERANCES, tolerance, side='right')) - 1
+
+
+def level_for_resolution(resolution):
+    """
+    Level for polyfilling at an H3 resolution: vertices may move by at most a
+    quarter of a hex edge, which leaves the filled cells practically unchanged.
+    """
+    return level_for_tolerance(_H3_EDGE_DEG.get(resolution, 0.0) / 4)
+
+
+def level_for_zoom(zoom, tile_size=256):
+    """Level for drawing at a web map zoom: vertices may move by at most one pixel."""
+    return level_for_tolerance(360.0 / (tile_size * 2 ** zoom))
+
+
+class GeometryLOD:
+    """County and dissolved state geometries at every level of TOLERANCES."""
+
+    def __init__(self, counties, directory=DATA_DIR):
+        self.counties = counties
+        self.directory = directory
+        self._counties = {0: counties}
+        self._states = {}
+
+    def _name(self, kind, level):
+        return '%s_%s_lod%d' % (self.counties.name, kind, level)
+
+    def build(self):
+        """Write every missing level. Reads the full-resolution counties once."""
+        missing = [(kind, level) for kind in ('counties', 'states') for level in range(len(TOLERANCES))
+                   if not (kind == 'counties' and level == 0)
+                   and not os.path.exists(os.path.join(self.directory, self._name(kind, level) + '.parquet'))]
+        if not missing:
+            return self
+
+        full = self.counties.all()[['GEOID', 'STATEFP', 'NAME', 'geometry']]
+        states = None
+        if any(kind == 'states' for kind, _ in missing):
+            states = full.dissolve(by='STATEFP', as_index=False)[['STATEFP', 'geometry']]
+            states = states.assign(GEOID=states.STATEFP)
+        for kind, level in missing:
+            frame = full if kind == 'counties' else states
+            if TOLERANCES[level]:
+                frame = frame.assign(geometry=frame.geometry.simplify(TOLERANCES[level], preserve_topology=True))
+            write_store(frame, os.path.join(self.directory, self._name(kind, level) + '.parquet'))
+        return self
+
+    def open(self):
+        self.build()
+        for level in range(len(TOLERANCES)):
+            if level:
+                self._counties[level] = CountyStore(self.directory, self._name('counties', level)).open()
+            self._states[level] = CountyStore(self.directory, self._name('states', level)).open()
+        return self
+
+    def county(self, geoid, level=0):
+        """One-row frame with the county's geometry at the given level."""
+        return self._counties[level].county(geoid, columns=['GEOID', 'STATEFP', 'geometry'])
+
+    def state_counties(self, statefp, level=0):
+        """All counties of a state at the given level."""
+        return self._counties[level].state(statefp, columns=['GEOID', 'STATEFP', 'NAME', 'geometry'])
+
+    def bbox(self, minx, miny, maxx, maxy, level=0):
+        """Counties whose bounding box intersects the lon/lat box, at the given level."""
+        return self._counties[level].bbox(minx, miny, maxx, maxy, columns=['GEOID', 'STATEFP', 'NAME', 'geometry'])
+
+    def state(self, statefp, level=0):
+        """One-row frame with the pre-dissolved state outline at the given level."""
+        return self._states[level].state(statefp, columns=['STATEFP', 'geometry'])
@@ -0,0 +1,177 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Business data sources for the mapping pipeline.
+
+A source yields DataFrame chunks with at least Lat/Lon columns. Local CSV
+and Parquet files are read chunk by chunk, with column selection and a
+lon/lat bounding box pushed down as far as the format allows (Parquet row
+group statistics, CSV usecols). stream_summary folds the chunks into a
+HexPyramid, optional per-county totals and a fixed-size uniform sample, so
+memory depends on the number of hexes and the sample size, not on the
+file size.
+
+The page only reads files under LOCAL_DIR ($YELPMAP_LOCAL_DIR, default
+files/local); local_path() resolves a name typed by a visitor inside it.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from yelpmap import DATA_DIR
+from yelpmap.pyramid import COARSEST, FINEST, HexPyramid
+from yelpmap.spatial_join import county_means, county_totals
+
+CHUNK_ROWS = 500_000
+SAMPLE_ROWS = 5_000
+LOCAL_DIR = os.environ.get("YELPMAP_LOCAL_DIR", os.path.join(DATA_DIR, 'local'))
+
+
+def bbox_mask(chunk, bbox):
+    """Rows of chunk inside bbox = (minx, miny, maxx, maxy) in lon/lat."""
+    minx, miny, maxx, maxy = bbox
+    lat = chunk.Lat.values
+    lon = chunk.Lon.values
+    return (lon >= minx) & (lon <= maxx) & (lat >= miny) & (lat <= maxy)
+
+
+class CSVSource:
+    """A CSV file read in chunks of chunk_rows; only the requested columns are parsed."""
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+
+    def iter_chunks(self, columns=None, bbox=None):
+        header = pd.read_csv(self.path, nrows=0).columns
+        usecols = None if columns is None else [c for c in columns if c in header]
+        dtype = {'Lat': np.float64, 'Lon': np.float64}
+        for chunk in pd.read_csv(self.path, usecols=usecols, dtype=dtype, chunksize=self.chunk_rows):
+            yield chunk[bbox_mask(chunk, bbox)] if bbox else chunk
+
+
+class ParquetSource:
+    """
+    A Parquet file or directory read as record batches. The bbox becomes a
+    dataset filter, so row groups whose statistics fall outside it are skipped.
+    """
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+
+    def iter_chunks(self, columns=None, bbox=None):
+        dataset = ds.dataset(self.path, format='parquet')
+        names = dataset.schema.names
+        columns = None if columns is None else [c for c in columns if c in names]
+        expression = None
+        if bbox:
+            minx, miny, maxx, maxy = bbox
+            expression = ((ds.field('Lon') >= minx) & (ds.field('Lon') <= maxx)
+                          & (ds.field('Lat') >= miny) & (ds.field('Lat') <= maxy))
+        for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=self.chunk_rows):
+            yield batch.to_pandas()
+
+
+def local_path(name, directory=LOCAL_DIR):
+    """
+    Real path of the file name inside directory. Raises ValueError if it
+    resolves outside directory (absolute paths, '..', symlinks) or doesn't exist.
+    """
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError("%r is outside the data directory %s" % (name, directory))
+    if not os.path.exists(path):
+        raise ValueError("There is no %r in the data directory %s" % (name, directory))
+    return path
+
+
+def open_source(path, chunk_rows=CHUNK_ROWS):
+    """CSVSource or ParquetSource, picked from the file extension."""
+    lower = path.lower()
+    if lower.endswith(('.csv', '.csv.gz', '.csv.bz2', '.csv.zip', '.txt')):
+        return CSVSource(path, chunk_rows)
+    if lower.endswith(('.parquet', '.pq')) or os.path.isdir(path):
+        return ParquetSource(path, chunk_rows)
+    raise ValueError("Don't know how to read %r; expected a .csv or .parquet file" % path)
+
+
+class StreamSummary:
+    """
+    What stream_summary keeps of a source: the pyramid, the county aggregates
+    (or None), a sample, the row count and the lon/lat bounds of all points.
+    """
+
+    def __init__(self, pyramid, counties, sample, rows, bounds):
+        self.pyramid = pyramid
+        self.counties = counties
+        self.sample = sample
+        self.rows = rows
+        self.bounds = bounds
+
+
+def stream_summary(source, finest=FINEST, coarsest=COARSEST, columns=('Rating', 'RatingCount'),
+                   bbox=None, sample_rows=SAMPLE_ROWS, seed=0, geometries=None):
+    """
+    Hexify and aggregate every chunk of source into one HexPyramid, keeping a
+    uniform sample of sample_rows rows (for tables, markers and map centering)
+    and the lon/lat bounds of all points. With geometries (a GeometryLOD)
+    every point is also joined to its county, for county_aggregates() of the
+    whole source.
+    """
+    rng = np.random.default_rng(seed)
+    read = ['Name', 'Lat', 'Lon', *columns]
+    pyramid = None
+    totals = []
+    sample = None
+    sample_keys = np.array([])
+    rows = 0
+    bounds = [np.inf, np.inf, -np.inf, -np.inf]
+
+    for chunk in source.iter_chunks(read, bbox):
+        missing = {'Lat', 'Lon'}.difference(chunk.columns)
+        if missing:
+            raise ValueError("The data has no %s column" % "/".join(sorted(missing)))
+        chunk = chunk[chunk.Lat.notna().values & chunk.Lon.notna().values]
+        if len(chunk) == 0:
+            continue
+        if pyramid is None:
+            pyramid = HexPyramid(finest, coarsest, [c for c in columns if c in chunk])
+        pyramid.add(chunk.Lat.values, chunk.Lon.values, {c: chunk[c].values for c in pyramid.columns})
+        if geometries is not None:
+            totals.append(county_totals(chunk, geometries))
+        rows += len(chunk)
+        bounds = [min(bounds[0], chunk.Lon.min()), min(bounds[1], chunk.Lat.min()),
+                  max(bounds[2], chunk.Lon.max()), max(bounds[3], chunk.Lat.max())]
+
+        # Reservoir sample: keep the rows with the smallest random keys seen so far.
+        chunk_keys = rng.random(len(chunk))
+        if len(chunk) > sample_rows:
+            top = np.argpartition(chunk_keys, sample_rows)[:sample_rows]
+            chunk, chunk_keys = chunk.iloc[top], chunk_keys[top]
+        keys = np.concatenate([sample_keys, chunk_keys])
+        pool = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+        keep = np.argsort(keys)[:sample_rows]
+        sample, sample_keys = pool.iloc[keep].reset_index(drop=True), keys[keep]
+
+    if pyramid is None:
+        pyramid = HexPyramid(finest, coarsest)
+        sample = pd.DataFrame({'Lat': [], 'Lon': []})
+    counties = county_means(pd.concat(totals, ignore_index=True)) if totals else None
+    return StreamSummary(pyramid, counties, sample, rows, tuple(bounds))
@@ -0,0 +1,92 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Point-in-county assignment and per-county aggregates.
+
+Only counties whose bounding box overlaps the points are read. Their
+polygons go into a shapely STRtree, and all points are matched in one bulk
+query with an 'intersects' predicate, so there is no per-point Python loop.
+county_totals() of separate chunks add up, so streamed data can be joined
+chunk by chunk and finished with county_means().
+"""
+
+import numpy as np
+import pandas as pd
+
+import shapely
+
+
+def assign_counties(lat, lon, geometries, level=0):
+    """
+    GEOID of the county containing each point (None outside every county),
+    as an object array aligned with lat/lon. level picks the GeometryLOD
+    level used for the test.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    result = np.full(len(lat), None, dtype=object)
+    ok = ~(np.isnan(lat) | np.isnan(lon))
+    if not ok.any():
+        return result
+
+    counties = geometries.bbox(lon[ok].min(), lat[ok].min(), lon[ok].max(), lat[ok].max(), level)
+    if len(counties) == 0:
+        return result
+
+    tree = shapely.STRtree(counties.geometry.values)
+    points = shapely.points(lon[ok], lat[ok])
+    point_idx, county_idx = tree.query(points, predicate='intersects')
+    # A point on a shared border intersects both counties; the last match wins.
+    result[np.flatnonzero(ok)[point_idx]] = counties.GEOID.values[county_idx]
+    return result
+
+
+def county_totals(df, geometries, level=0, value='Rating'):
+    """
+    Per-county business count, and sum and non-null count of value (when df
+    has it): a frame with GEOID, counts, sum_<value> and valid_<value>, one
+    row per county with at least one point.
+    """
+    geoid = assign_counties(df.Lat.values, df.Lon.values, geometries, level)
+    inside = pd.notna(geoid)
+    grouped = pd.DataFrame({'GEOID': geoid[inside], 'counts': 1})
+    if value in df:
+        v = np.asarray(df[value].values[inside], dtype=np.float64)
+        ok = ~np.isnan(v)
+        grouped['sum_' + value.lower()] = np.where(ok, v, 0.0)
+        grouped['valid_' + value.lower()] = ok.astype(np.int64)
+    return grouped.groupby('GEOID', sort=True).sum().reset_index()
+
+
+def county_means(totals, value='Rating'):
+    """
+    Add up county_totals() frames (concatenated, e.g. one per chunk) into
+    GEOID, counts and mean_<value>.
+    """
+    totals = totals.groupby('GEOID', sort=True).sum().reset_index()
+    out = totals[['GEOID', 'counts']].copy()
+    name = value.lower()
+    if 'sum_' + name in totals:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out['mean_' + name] = totals['sum_' + name].values / totals['valid_' + name].values
+    return out
+
+
+def county_aggregates(df, geometries, level=0, value='Rating'):
+    """
+    Per-county business count and mean of value (when df has it): a frame with
+    GEOID, counts and mean_<value>, one row per county with at least one point.
+    """
+    return county_means(county_totals(df, geometries, level, value), value)
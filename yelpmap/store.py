@@ -0,0 +1,106 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Versioned on-disk store of precomputed search results.
+
+Layout: <root>/v<VERSION>/<location>__<term>/ holding businesses.parquet,
+hexes_r<res>.parquet (the STORED_AGGS of HexPyramid.level) and one
+manifest_r<res>.json per finished job. A job counts as done once its
+manifest exists, which makes batch runs resumable. Bump VERSION when the
+layout or the aggregates change.
+"""
+
+import json
+import os
+import re
+
+import pandas as pd
+
+from yelpmap import DATA_DIR
+from yelpmap.atomic import atomic_path
+
+VERSION = 1
+
+# The aggregates written per resolution, as HexPyramid.level() aggs.
+STORED_AGGS = {'counts': (None, 'count'), 'mean_rating': ('Rating', 'mean')}
+
+
+def slug(text):
+    """Lower-case, filesystem-safe form of a location or search term."""
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+class AggregateStore:
+    def __init__(self, root=os.path.join(DATA_DIR, 'store'), version=VERSION):
+        self.root = os.path.join(root, 'v%d' % version)
+
+    def directory(self, location, term):
+        return os.path.join(self.root, '%s__%s' % (slug(location), slug(term)))
+
+    def _path(self, location, term, name):
+        return os.path.join(self.directory(location, term), name)
+
+    def write_frame(self, location, term, name, frame):
+        """Write frame as Parquet (GeoParquet for GeoDataFrames), atomically."""
+        path = self._path(location, term, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Jobs for several resolutions of one search may write the same file.
+        with atomic_path(path) as tmp_path:
+            frame.to_parquet(tmp_path, index=False)
+        return path
+
+    def write_manifest(self, location, term, resolution, manifest):
+        directory = self.directory(location, term)
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(location, term, 'manifest_r%d.json' % resolution)
+        with atomic_path(path) as tmp_path, open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    def done(self, location, term, resolution):
+        return os.path.exists(self._path(location, term, 'manifest_r%d.json' % resolution))
+
+    def businesses(self, location, term):
+        """The stored business frame, or None."""
+        path = self._path(location, term, 'businesses.parquet')
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def hexes(self, location, term, resolution):
+        """The stored hex aggregates at resolution, or None."""
+        path = self._path(location, term, 'hexes_r%d.parquet' % resolution)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+class StoredPyramid:
+    """
+    HexPyramid stand-in that serves level() from the store where a job has
+    written that resolution and from fallback() (a HexPyramid) otherwise.
+    Both are built the same way from the same businesses, so they agree;
+    aggregates the store doesn't keep always come from the fallback.
+    """
+
+    def __init__(self, store, location, term, fallback):
+        self.store = store
+        self.location = location
+        self.term = term
+        self.fallback = fallback
+
+    def level(self, resolution, aggs=None):
+        names = ['counts'] if aggs is None else list(aggs)
+        if all(name in STORED_AGGS for name in names) and all(
+                STORED_AGGS[name] == spec for name, spec in (aggs or {}).items()):
+            stored = self.store.hexes(self.location, self.term, resolution)
+            if stored is not None:
+                return stored[['hex_id', *names]]
+        return self.fallback().level(resolution, aggs)
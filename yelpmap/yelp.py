@@ -0,0 +1,165 @@
+# Copyright (c) Streamlit Inc. (2018-2022) Snowflake Inc. (2022)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fetch engine for the Yelp business search API.
+
+One pooled requests.Session is shared by a small thread pool. Every request
+goes through a token-bucket rate limiter, and 429/5xx responses are retried
+after the server's Retry-After (or an exponential backoff). Pages are yielded
+as they arrive. Point base_url at a local stub server to exercise it offline.
+"""
+
+import email.utils
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Overridable so the page can be pointed at a stub server (see benchmarks/).
+SEARCH_URL = os.environ.get("YELP_SEARCH_URL", "https://api.yelp.com/v3/businesses/search")
+PAGE_SIZE = 50
+# Yelp refuses to page past offset + limit = 1000.
+MAX_RESULTS = 1000
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` requests per second, bursts of `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_after(response):
+    """Seconds to wait according to a Retry-After header, or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class YelpClient:
+    """
+    Pooled, rate-limited and retrying client for the business search endpoint.
+    The client is thread-safe and meant to be reused across reruns.
+    """
+
+    def __init__(self, api_key, base_url=SEARCH_URL, max_workers=4, rate=5.0, burst=None,
+                 retries=4, backoff=0.5, timeout=10.0):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate, burst or max_workers)
+
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = "Bearer %s" % api_key
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def get_page(self, params):
+        """
+        GET one page and return its decoded JSON. Returns None on 400, which
+        Yelp sends for an unknown location or an offset past the window.
+        """
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            if response.status_code == 400:
+                return None
+            if response.status_code in _RETRY_STATUSES and attempt < self.retries:
+                wait = retry_after(response)
+                time.sleep(self.backoff * 2 ** attempt if wait is None else wait)
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def iter_pages(self, location, term, max_results=MAX_RESULTS, cancelled=None):
+        """
+        Yield the `businesses` list of every page of a search as soon as it
+        arrives. The first page is fetched alone to learn the total; the rest
+        are requested concurrently, so later pages may come out of order.
+        Setting the threading.Event cancelled stops the search with
+        CancelledError and drops the requests that have not started.
+        """
+        def params(offset):
+            return {
+                'limit': min(PAGE_SIZE, max_results - offset),
+                'location': location.replace(' ', '+'),
+                'term': term.replace(' ', '+'),
+                'offset': offset
+            }
+
+        first = self.get_page(params(0))
+        if first is None:
+            return
+        yield first['businesses']
+
+        total = min(first.get('total', 0), max_results)
+        offsets = range(PAGE_SIZE, total, PAGE_SIZE)
+        if not offsets:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(self.get_page, params(offset)) for offset in offsets]
+            for future in as_completed(futures):
+                if cancelled is not None and cancelled.is_set():
+                    raise CancelledError()
+                page = future.result()
+                if page is not None:
+                    yield page['businesses']
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)